@@ -0,0 +1,389 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+from src.config import WINDOW_SIZE
+from src.market_data_stub import start_stub_server
+
+# --- Benchmark de carga da API ---
+# Sobe a API localmente (uvicorn, ou src.serve com --api-workers > 1) apontando
+# o /sample-data para o stub do Alpha Vantage, e dispara carga em /predict,
+# /health e /sample-data:
+# - closed-loop (--concurrency): N clientes, cada um envia a próxima requisição
+#   assim que recebe a resposta. Mede a vazão máxima com N em voo.
+# - open-loop (--rates): chegadas Poisson a R req/s, independentes das
+#   respostas. A latência conta a partir do horário agendado, então filas no
+#   servidor aparecem no p99 (sem "coordinated omission").
+# Resultados em JSON (reports/benchmark/); --compare aponta regressões contra
+# uma execução anterior e sai com código 1.
+# Cache de previsões: a API local sobe com PREDICTION_CACHE_SIZE=0 (a menos de
+# --same-window) e cada cenário usa janelas próprias, em quantidade maior que o
+# cache padrão; a taxa de acerto do cache (lida do /metrics) sai junto com a
+# latência, para confirmar o que foi medido (com --url, a API é a externa).
+# Uso: python benchmark_api.py --concurrency 1 8 32 --rates 100 400 --duration 10
+#      python benchmark_api.py --url http://localhost:8000 --compare reports/benchmark/base.json
+
+ENDPOINTS = {
+    "predict": ("POST", "/predict"),
+    "health": ("GET", "/health"),
+    "sample-data": ("GET", "/sample-data"),
+}
+PERCENTILES = (50, 95, 99, 99.9)
+# Janelas distintas por cenário: acima do PREDICTION_CACHE_SIZE padrão (4096)
+JANELAS_POR_CENARIO = 16384
+OUT_DIR = os.path.join("reports", "benchmark")
+BOOT_TIMEOUT_S = 180
+
+
+# --- Servidor ---
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def subir_api(port: int, stub_url: str, api_workers: int, cache: bool) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        ALPHAVANTAGE_BASE_URL=stub_url,
+        ALPHAVANTAGE_API_KEY=os.getenv("ALPHAVANTAGE_API_KEY", "benchmark"),
+    )
+    if not cache:
+        # Sem cache de previsões: todo /predict passa pelo modelo
+        env["PREDICTION_CACHE_SIZE"] = "0"
+    if api_workers > 1:
+        cmd = [sys.executable, "-m", "src.serve", "--workers", str(api_workers), "--host", "127.0.0.1", "--port", str(port)]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "src.app:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def aguardar_api(url: str, processo: subprocess.Popen | None) -> dict:
+    """Espera o /health responder com o modelo carregado."""
+    limite = time.monotonic() + BOOT_TIMEOUT_S
+    async with httpx.AsyncClient(base_url=url, timeout=5) as client:
+        while time.monotonic() < limite:
+            if processo is not None and processo.poll() is not None:
+                raise RuntimeError(f"API encerrou durante o startup (código {processo.returncode}).")
+            try:
+                health = (await client.get("/health")).json()
+                if health.get("status") == "error":
+                    raise RuntimeError(f"API sem modelo: {health.get('detail')}")
+                if health.get("model_loaded"):
+                    return health
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"API não ficou pronta em {BOOT_TIMEOUT_S}s.")
+
+
+# --- Carga ---
+
+def corpos_predict(n: int, seed: int, repetir: bool) -> list[bytes]:
+    """Janelas sintéticas; distintas por padrão (uma seed por cenário) para não medir só o cache."""
+    rng = np.random.default_rng(seed)
+    janelas = 30.0 + np.cumsum(rng.normal(0, 0.3, (1 if repetir else n, WINDOW_SIZE)), axis=1)
+    return [json.dumps({"last_60_days": j.round(2).tolist()}).encode() for j in janelas]
+
+
+class Coletor:
+    def __init__(self, inicio_medicao: float):
+        self.inicio_medicao = inicio_medicao
+        self.latencias: list[float] = []
+        self.erros = 0
+        self.status: dict[str, int] = {}
+
+    def registrar(self, agendado: float, status: str):
+        fim = time.perf_counter()
+        if agendado < self.inicio_medicao:
+            return  # aquecimento
+        self.status[status] = self.status.get(status, 0) + 1
+        if status.startswith("2"):
+            self.latencias.append(fim - agendado)
+        else:
+            self.erros += 1
+
+
+async def enviar(client: httpx.AsyncClient, metodo: str, rota: str, corpo: bytes | None) -> str:
+    try:
+        if metodo == "POST":
+            resposta = await client.post(rota, content=corpo, headers={"Content-Type": "application/json"})
+        else:
+            resposta = await client.get(rota)
+        await resposta.aread()
+        return str(resposta.status_code)
+    except httpx.HTTPError as e:
+        return type(e).__name__
+
+
+async def closed_loop(client, metodo, rota, corpos, concorrencia, aquecimento, duracao) -> tuple[Coletor, float]:
+    inicio = time.perf_counter()
+    coletor = Coletor(inicio + aquecimento)
+    fim = coletor.inicio_medicao + duracao
+
+    async def cliente(i: int):
+        n = i
+        while time.perf_counter() < fim:
+            agendado = time.perf_counter()
+            status = await enviar(client, metodo, rota, corpos[n % len(corpos)] if corpos else None)
+            coletor.registrar(agendado, status)
+            n += concorrencia
+
+    await asyncio.gather(*(cliente(i) for i in range(concorrencia)))
+    return coletor, time.perf_counter() - coletor.inicio_medicao
+
+
+async def open_loop(client, metodo, rota, corpos, taxa, aquecimento, duracao, max_em_voo, seed):
+    inicio = time.perf_counter()
+    coletor = Coletor(inicio + aquecimento)
+    fim = coletor.inicio_medicao + duracao
+    rng = np.random.default_rng(seed)
+    em_voo: set[asyncio.Task] = set()
+    descartadas = 0
+
+    async def requisicao(agendado: float, n: int):
+        status = await enviar(client, metodo, rota, corpos[n % len(corpos)] if corpos else None)
+        coletor.registrar(agendado, status)
+
+    agendado, n = inicio, 0
+    while agendado < fim:
+        agendado += rng.exponential(1.0 / taxa)
+        espera = agendado - time.perf_counter()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        if len(em_voo) >= max_em_voo:
+            # Servidor saturado: conta como erro em vez de acumular tarefas sem limite
+            if agendado >= coletor.inicio_medicao:
+                descartadas += 1
+                coletor.erros += 1
+            continue
+        tarefa = asyncio.create_task(requisicao(agendado, n))
+        em_voo.add(tarefa)
+        tarefa.add_done_callback(em_voo.discard)
+        n += 1
+    if em_voo:
+        await asyncio.gather(*em_voo)
+    coletor.status["descartadas"] = descartadas
+    return coletor, time.perf_counter() - coletor.inicio_medicao
+
+
+async def contadores_cache(client: httpx.AsyncClient) -> tuple[float, float] | None:
+    """(acertos, falhas) acumulados do cache de previsões, lidos do /metrics; None se indisponível."""
+    from prometheus_client.parser import text_string_to_metric_families
+
+    try:
+        resposta = await client.get("/metrics")
+        resposta.raise_for_status()
+        valores = {
+            amostra.name: amostra.value
+            for familia in text_string_to_metric_families(resposta.text)
+            for amostra in familia.samples
+        }
+    except (httpx.HTTPError, ValueError):
+        return None
+    return valores.get("prediction_cache_hits_total", 0.0), valores.get("prediction_cache_misses_total", 0.0)
+
+
+def taxa_acerto(antes, depois) -> float | None:
+    """Acertos / consultas ao cache no intervalo (None sem /metrics ou com o cache desligado)."""
+    if antes is None or depois is None:
+        return None
+    acertos, falhas = depois[0] - antes[0], depois[1] - antes[1]
+    consultas = acertos + falhas
+    return round(acertos / consultas, 4) if consultas > 0 else None
+
+
+def resumo(nome: str, endpoint: str, modo: str, carga: float, coletor: Coletor, decorrido: float) -> dict:
+    lat_ms = np.asarray(coletor.latencias) * 1000
+    ok = len(lat_ms)
+    resultado = {
+        "name": nome,
+        "endpoint": endpoint,
+        "mode": modo,
+        "concurrency" if modo == "closed" else "target_rps": carga,
+        "requests": ok + coletor.erros,
+        "errors": coletor.erros,
+        "status": coletor.status,
+        "seconds": round(decorrido, 3),
+        "rps": round(ok / decorrido, 2) if decorrido > 0 else 0.0,
+    }
+    if ok:
+        valores = np.percentile(lat_ms, PERCENTILES)
+        resultado["latency_ms"] = {
+            **{f"p{p:g}": round(float(v), 3) for p, v in zip(PERCENTILES, valores)},
+            "mean": round(float(lat_ms.mean()), 3),
+            "max": round(float(lat_ms.max()), 3),
+        }
+    return resultado
+
+
+async def executar(args, url: str) -> list[dict]:
+    limites = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    cenarios = []
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limites) as client:
+        for endpoint in args.endpoints:
+            metodo, rota = ENDPOINTS[endpoint]
+            cargas = [("closed", c) for c in args.concurrency] + [("open", t) for t in args.rates]
+            for modo, carga in cargas:
+                # Cada cenário com as próprias janelas: o anterior não aquece o cache deste
+                seed = args.seed + len(cenarios)
+                corpos = corpos_predict(JANELAS_POR_CENARIO, seed, args.same_window) if metodo == "POST" else None
+                antes = await contadores_cache(client)
+                if modo == "closed":
+                    nome = f"{endpoint}@c{carga}"
+                    coletor, decorrido = await closed_loop(
+                        client, metodo, rota, corpos, carga, args.warmup, args.duration
+                    )
+                else:
+                    nome = f"{endpoint}@r{carga:g}"
+                    coletor, decorrido = await open_loop(
+                        client, metodo, rota, corpos, carga, args.warmup, args.duration,
+                        args.max_connections * 4, seed,
+                    )
+                cenario = resumo(nome, endpoint, modo, carga, coletor, decorrido)
+                cenario["cache_hit_ratio"] = taxa_acerto(antes, await contadores_cache(client))
+                cenarios.append(cenario)
+                imprimir(cenario)
+    return cenarios
+
+
+# --- Relatório ---
+
+def imprimir_cabecalho():
+    print(
+        f"{'cenário':<22}{'req':>8}{'erros':>7}{'RPS':>10}"
+        + "".join(f"{'p' + format(p, 'g'):>10}" for p in PERCENTILES)
+        + f"{'cache':>9}  (ms; cache = taxa de acerto)"
+    )
+
+
+def imprimir(cenario: dict):
+    lat = cenario.get("latency_ms", {})
+    acerto = cenario.get("cache_hit_ratio")
+    print(
+        f"{cenario['name']:<22}{cenario['requests']:>8}{cenario['errors']:>7}{cenario['rps']:>10.1f}"
+        + "".join(f"{lat.get(f'p{p:g}', float('nan')):>10.2f}" for p in PERCENTILES)
+        + (f"{acerto:>9.1%}" if acerto is not None else f"{'-':>9}")
+    )
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(atual: dict, base: dict, limiar: float) -> bool:
+    """Compara cenário a cenário (p99 e RPS); True se houve regressão acima do limiar."""
+    anteriores = {c["name"]: c for c in base["scenarios"]}
+    print("\n" + "=" * 60)
+    print(f"📈 COMPARAÇÃO com {base['meta'].get('commit') or '?'} ({base['meta'].get('timestamp')})")
+    print("=" * 60)
+    print(f"{'cenário':<22}{'RPS':>18}{'p99 (ms)':>22}")
+    regressao = False
+    for cenario in atual["scenarios"]:
+        anterior = anteriores.get(cenario["name"])
+        if anterior is None or "latency_ms" not in cenario or "latency_ms" not in anterior:
+            continue
+        rps_delta = (cenario["rps"] - anterior["rps"]) / max(anterior["rps"], 1e-9)
+        p99_delta = (cenario["latency_ms"]["p99"] - anterior["latency_ms"]["p99"]) / max(anterior["latency_ms"]["p99"], 1e-9)
+        # Open-loop: a vazão é a taxa pedida, então só a latência (e os erros) contam
+        piorou = p99_delta > limiar or (cenario["mode"] == "closed" and rps_delta < -limiar)
+        piorou |= cenario["errors"] > anterior["errors"]
+        regressao |= piorou
+        print(
+            f"{cenario['name']:<22}{cenario['rps']:>10.1f} ({rps_delta:+6.1%})"
+            f"{cenario['latency_ms']['p99']:>12.2f} ({p99_delta:+6.1%})  {'❌' if piorou else '✅'}"
+        )
+    return regressao
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga da API (RPS e latência de cauda).")
+    parser.add_argument("--url", default=None, help="API já em execução (não sobe servidor nem stub).")
+    parser.add_argument("--api-workers", type=int, default=1, help="> 1 sobe via src.serve.")
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 8, 32], help="Cenários closed-loop.")
+    parser.add_argument("--rates", type=float, nargs="*", default=[], help="Cenários open-loop (req/s).")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos medidos por cenário.")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Segundos descartados no início de cada cenário.")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--max-connections", type=int, default=64)
+    parser.add_argument("--same-window", action="store_true", help="Repete a mesma janela (mede o cache de previsões).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help=f"Padrão: {OUT_DIR}/api-<data>.json")
+    parser.add_argument("--compare", default=None, help="JSON de uma execução anterior.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Piora relativa tolerada no --compare.")
+    args = parser.parse_args()
+
+    processo = stub = None
+    url = args.url
+    if url is None:
+        stub, _ = start_stub_server()
+        port = porta_livre()
+        url = f"http://127.0.0.1:{port}"
+        print(f"🚀 Subindo a API em {url} (stub do Alpha Vantage na porta {stub.server_port})...")
+        processo = subir_api(port, f"http://127.0.0.1:{stub.server_port}/query", args.api_workers, args.same_window)
+
+    try:
+        health = asyncio.run(aguardar_api(url, processo))
+        print(f"✅ API pronta: serving_mode={health.get('serving_mode')} backend={health.get('inference_backend')}\n")
+        imprimir_cabecalho()
+        cenarios = asyncio.run(executar(args, url))
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait(timeout=30)
+        if stub is not None:
+            stub.shutdown()
+
+    resultado = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "url": url if args.url else "local",
+            "api_workers": args.api_workers if not args.url else None,
+            "serving_mode": health.get("serving_mode"),
+            "inference_backend": health.get("inference_backend"),
+            "model_version": health.get("model_version"),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "same_window": args.same_window,
+            "prediction_cache": "external" if args.url else ("enabled" if args.same_window else "disabled"),
+        },
+        "scenarios": cenarios,
+    }
+    out = args.out or os.path.join(OUT_DIR, f"api-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 {out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if comparar(resultado, base, args.threshold):
+            print(f"\n❌ Regressão acima de {args.threshold:.0%}.")
+            sys.exit(1)
+        print("\n✅ Sem regressões.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")
+
+import numpy as np
+
+from src.model_registry import load_keras_model
+from src.config import WINDOW_SIZE
+from src.inference import BACKENDS, create_backend
+
+# --- Configuração ---
+MODEL_PATH = 'src/models/lstm_model.keras'
+TOLERANCE = 1e-4       # Diferença máxima aceita (escala normalizada) contra o Keras
+BATCH_SIZES = [1, 32, 256]
+REPEATS = 50
+SERVING_MODES = ["tensorflow", "numpy"]
+
+# Executado em um processo limpo por modo: mede import do app, lifespan e RSS
+STARTUP_PROBE = """
+import asyncio, json, resource, sys, time
+inicio = time.perf_counter()
+import src.app as api
+fim_import = time.perf_counter()
+
+async def subir():
+    async with api.app.router.lifespan_context(api.app):
+        pass
+
+asyncio.run(subir())
+fim_startup = time.perf_counter()
+print(json.dumps({
+    "import_s": fim_import - inicio,
+    "startup_s": fim_startup - fim_import,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "erro": api.ml_models.get("error"),
+    "modulos": [m for m in ("tensorflow", "sklearn", "joblib") if m in sys.modules],
+}))
+"""
+
+
+def medir_startup():
+    print("=" * 60)
+    print("🚀 STARTUP POR SERVING_MODE (processo limpo)")
+    print("=" * 60)
+    print(f"{'modo':<12}{'import (s)':>12}{'lifespan (s)':>14}{'RSS máx (MB)':>14}  módulos pesados")
+    for modo in SERVING_MODES:
+        env = dict(os.environ, SERVING_MODE=modo)
+        saida = subprocess.run(
+            [sys.executable, "-c", STARTUP_PROBE],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        r = json.loads(saida.stdout.strip().splitlines()[-1])
+        if r["erro"]:
+            print(f"{modo:<12}❌ {r['erro']}")
+            continue
+        print(
+            f"{modo:<12}{r['import_s']:>12.2f}{r['startup_s']:>14.2f}{r['max_rss_mb']:>14.1f}"
+            f"  {', '.join(r['modulos']) or '-'}"
+        )
+
+
+def medir_latencia(backend, batch, repeats):
+    tempos = []
+    for _ in range(repeats):
+        inicio = time.perf_counter()
+        backend.predict(batch)
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Paridade e latência dos backends de inferência contra o Keras."
+    )
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument(
+        "--startup", action="store_true",
+        help="Mede tempo de import/startup e memória de cada SERVING_MODE.",
+    )
+    args = parser.parse_args()
+
+    if args.startup:
+        medir_startup()
+        return
+
+    print(f"⏳ Carregando {args.model}...")
+    model = load_keras_model(args.model)
+    backends = {name: create_backend(model, name) for name in BACKENDS}
+
+    # Janelas sintéticas na faixa do MinMaxScaler ([0, 1])
+    rng = np.random.default_rng(42)
+    amostras = {
+        batch_size: rng.uniform(0.0, 1.0, (batch_size, WINDOW_SIZE, 1)).astype(np.float32)
+        for batch_size in BATCH_SIZES
+    }
+
+    # 1. Paridade contra o model.predict do Keras
+    print("\n" + "=" * 60)
+    print("🎯 PARIDADE (máx. |backend - keras|, escala normalizada)")
+    print("=" * 60)
+    falhou = False
+    referencia = {b: backends["keras"].predict(x) for b, x in amostras.items()}
+    for name, backend in backends.items():
+        if name == "keras":
+            continue
+        diff = max(
+            float(np.max(np.abs(backend.predict(x) - referencia[b])))
+            for b, x in amostras.items()
+        )
+        ok = diff <= args.tolerance
+        falhou |= not ok
+        print(f"{backend.name:<12} {diff:.2e}  {'✅' if ok else '❌'}")
+
+    # 2. Latência mediana por chamada
+    print("\n" + "=" * 60)
+    print("⏱️  LATÊNCIA MEDIANA (ms por chamada)")
+    print("=" * 60)
+    print(f"{'backend':<12}" + "".join(f"{'batch=' + str(b):>12}" for b in BATCH_SIZES))
+    for name, backend in backends.items():
+        linha = [medir_latencia(backend, amostras[b], args.repeats) for b in BATCH_SIZES]
+        print(f"{backend.name:<12}" + "".join(f"{ms:>12.3f}" for ms in linha))
+
+    if falhou:
+        print(f"\n❌ Paridade acima da tolerância ({args.tolerance}).")
+        sys.exit(1)
+    print("\n✅ Todos os backends dentro da tolerância.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,34 @@
-import yfinance as yf
-import pandas as pd
-import os
+import argparse
+
+from src.data_store import START_DATE, DataStore
 
 # Configurações iniciais baseadas no PDF [cite: 21, 22, 23]
-SYMBOL = 'PETR4.SA' 
-START_DATE = '2018-01-01'
-END_DATE = '2024-12-30' # Atualizado para pegar dados recentes
+SYMBOL = 'PETR4.SA'
+
+# Histórico salvo em data/store/ (Parquet por ticker/ano). Cada execução baixa
+# só os pregões posteriores ao último já salvo (desde START_DATE na primeira vez).
+# Sem rede: --from-csv importa um CSV antigo do coleta_dados.py (ou uma fixture).
+
+def download_data(symbols=None, end=None, from_csv=None):
+    store = DataStore()
+    for symbol in symbols or [SYMBOL]:
+        if from_csv:
+            print(f"Importando {from_csv} para {symbol}...")
+            added = store.import_csv(from_csv, symbol)
+        else:
+            print(f"Atualizando {symbol} (início do histórico: {START_DATE})...")
+            added = store.fetch(symbol, end=end)
 
-def download_data():
-    print(f"Baixando dados para {SYMBOL}...")
-    
-    #Use a função download para obter os dados
-    df = yf.download(SYMBOL, start=START_DATE, end=END_DATE)
-    
-    # Verificação básica de qualidade (Issue #2 simplificada)
-    if df.empty:
-        print("Erro: Nenhum dado baixado. Verifique o Símbolo ou sua internet.")
-        return
-    
-    # Tratamento de nulos com ffill (preencher gaps)
-    df = df.ffill()
-    
-    # Salvar em CSV para inspeção fácil (mais simples que Parquet agora)
-    os.makedirs('data', exist_ok=True)
-    file_path = f'data/{SYMBOL}.csv'
-    df.to_csv(file_path)
-    
-    print(f"Sucesso! {len(df)} linhas salvas em {file_path}")
-    print(df.head())
+        # Verificação básica de qualidade (Issue #2 simplificada)
+        closes = store.closes(symbol)
+        print(f"Sucesso! +{added} linhas; {len(closes)} pregões de {closes.index[0].date()} "
+              f"a {closes.index[-1].date()} em {store.ticker_dir(symbol)}")
+        print(closes.tail())
 
 if __name__ == "__main__":
-    download_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Coleta incremental do histórico de preços.")
+    parser.add_argument("symbols", nargs="*", default=[SYMBOL])
+    parser.add_argument("--end", default=None, help="Data final exclusiva (AAAA-MM-DD); padrão: hoje.")
+    parser.add_argument("--from-csv", default=None, help="Importa um CSV local em vez de baixar.")
+    args = parser.parse_args()
+    download_data(args.symbols, end=args.end, from_csv=args.from_csv)
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")
+
+import numpy as np
+
+from src.config import DEFAULT_TICKER, WINDOW_SIZE
+from src.model_registry import load_keras_model, load_scaler
+from src.inference import (
+    TFLITE_PRECISIONS,
+    TFFunctionBackend,
+    export_npz,
+    export_tflite,
+    load_tflite,
+    measure_latency,
+    tflite_buckets,
+    tflite_dir,
+)
+from src.lstm_numpy import load_npz
+
+# Configurações padrão (mesmo layout que o lifespan da API espera)
+MODELS_DIR = 'src/models'
+DRIFT_REPORT = 'drift_report.json'
+
+
+def carregar(models_dir: str):
+    print(f"⏳ Carregando artefatos de {models_dir}...")
+    model = load_keras_model(os.path.join(models_dir, 'lstm_model.keras'))
+    scaler_x = load_scaler(os.path.join(models_dir, 'scaler_X.pkl'))
+    scaler_y = load_scaler(os.path.join(models_dir, 'scaler_Y.pkl'))
+    return model, scaler_x, scaler_y
+
+
+def exportar(models_dir: str, out_path: str):
+    model, scaler_x, scaler_y = carregar(models_dir)
+
+    export_npz(model, scaler_x, scaler_y, out_path)
+
+    # Verificação de sanidade: o .npz deve reproduzir Keras + scalers
+    runtime, sx, sy = load_npz(out_path)
+    janela = np.linspace(25.0, 35.0, 60).reshape(-1, 1)
+    entrada = sx.transform(janela).reshape(1, 60, 1).astype(np.float32)
+    esperado = scaler_y.inverse_transform(model.predict(entrada, verbose=0))[0][0]
+    obtido = sy.inverse_transform(runtime.predict(entrada))[0][0]
+
+    tamanho_kb = os.path.getsize(out_path) / 1024
+    print(f"✅ Artefato salvo em {out_path} ({tamanho_kb:.1f} KB)")
+    print(f"   Keras: R$ {esperado:.4f} | NumPy: R$ {obtido:.4f}")
+
+
+def janelas_de_teste(ticker: str, csv_path=None, start=None, end=None):
+    """Janelas (N, 60) e alvos D+1 (N,) em R$ do split de teste (mesmos cortes do treino)."""
+    from src.data_store import load_series
+    from src.train import split_bounds
+    from src.windowing import sliding_windows
+
+    close = load_series(ticker, csv_path, start, end).to_numpy(dtype=np.float64)
+    x_raw, y_raw = close[:-1], close[1:]
+    n_windows = len(x_raw) - WINDOW_SIZE + 1
+    _, val_end = split_bounds(n_windows)
+    if n_windows <= val_end:
+        raise ValueError(f"Histórico insuficiente para o split de teste: {len(close)} dias.")
+    return sliding_windows(x_raw)[val_end:], y_raw[val_end + WINDOW_SIZE - 1:]
+
+
+def prever(backend, scaler_x, scaler_y, janelas: np.ndarray) -> np.ndarray:
+    entrada = scaler_x.transform(janelas.reshape(-1, 1)).reshape(len(janelas), WINDOW_SIZE, 1)
+    saida = backend.predict(entrada.astype(np.float32))
+    return scaler_y.inverse_transform(np.asarray(saida).reshape(-1, 1)).ravel()
+
+
+def exportar_tflite(models_dir: str, precisoes, ticker: str, csv_path=None, start=None, end=None, buckets=None):
+    """
+    Exporta cada precisão para <models_dir>/tflite_<precisão>/ e grava ao lado o
+    drift_report.json: MAE em R$ no split de teste do modelo float (tf_function)
+    vs quantizado, diferença entre as previsões, tamanho e latência por lote.
+    """
+    model, scaler_x, scaler_y = carregar(models_dir)
+    janelas, alvos = janelas_de_teste(ticker, csv_path, start, end)
+    referencia = TFFunctionBackend(model)
+    pred_float = prever(referencia, scaler_x, scaler_y, janelas)
+    mae_float = float(np.mean(np.abs(pred_float - alvos)))
+    lotes = sorted({1, max(buckets or tflite_buckets())})
+    latencia_float = {str(b): round(measure_latency(referencia, b), 3) for b in lotes}
+    print(f"📏 Float32 (tf_function): MAE R$ {mae_float:.4f} em {len(alvos)} janelas de teste")
+
+    relatorios = {}
+    for precisao in precisoes:
+        out_dir = tflite_dir(models_dir, precisao)
+        export_tflite(model, scaler_x, scaler_y, out_dir, precisao, buckets)
+        backend, sx, sy, paths = load_tflite(out_dir)
+        pred = prever(backend, sx, sy, janelas)
+        diff = np.abs(pred - pred_float)
+        mae = float(np.mean(np.abs(pred - alvos)))
+        relatorio = {
+            "ticker": ticker,
+            "source": os.path.abspath(csv_path) if csv_path else "data_store",
+            "precision": precisao,
+            "buckets": list(backend.buckets),
+            "test_windows": int(len(alvos)),
+            "mae_float": round(mae_float, 4),
+            "mae_quantized": round(mae, 4),
+            "mae_drift": round(mae - mae_float, 4),
+            "prediction_diff_mean": round(float(diff.mean()), 4),
+            "prediction_diff_max": round(float(diff.max()), 4),
+            "float_params_bytes": int(model.count_params() * 4),
+            "artifact_bytes": int(sum(os.path.getsize(p) for p in paths[1:])),
+            "latency_ms_float": latencia_float,
+            "latency_ms_quantized": {str(b): round(measure_latency(backend, b), 3) for b in lotes},
+        }
+        with open(os.path.join(out_dir, DRIFT_REPORT), "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        relatorios[precisao] = relatorio
+
+        latencias = " | ".join(
+            f"lote {b}: {relatorio['latency_ms_float'][b]:.2f} -> {relatorio['latency_ms_quantized'][b]:.2f} ms"
+            for b in relatorio["latency_ms_quantized"]
+        )
+        print(f"✅ {precisao}: {out_dir} ({relatorio['artifact_bytes'] / 1024:.1f} KB)")
+        print(
+            f"   MAE R$ {mae:.4f} (drift {mae - mae_float:+.4f}) | "
+            f"diferença média/máx. R$ {diff.mean():.4f}/{diff.max():.4f} | {latencias}"
+        )
+    return relatorios
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Exporta lstm_model.keras + scalers para o artefato .npz do SERVING_MODE=numpy "
+                    "ou, com --tflite, para modelos quantizados do SERVING_MODE=tflite."
+    )
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--out", default=None, help="Padrão: <models-dir>/lstm_model.npz")
+    parser.add_argument("--tflite", nargs="+", default=None, choices=TFLITE_PRECISIONS,
+                        help="Precisões exportadas para <models-dir>/tflite_<precisão>/.")
+    parser.add_argument("--buckets", type=int, nargs="+", default=None,
+                        help="Tamanhos de lote exportados (padrão: potências de 2 até BATCH_MAX_SIZE).")
+    parser.add_argument("--ticker", default=DEFAULT_TICKER, help="Série usada no relatório de drift.")
+    parser.add_argument("--csv", default=None, help="Lê de um CSV em vez do store (data/store).")
+    parser.add_argument("--start", default=None, help="Primeiro pregão usado (AAAA-MM-DD).")
+    parser.add_argument("--end", default=None, help="Último pregão usado (AAAA-MM-DD).")
+    args = parser.parse_args()
+    if args.tflite:
+        exportar_tflite(args.models_dir, args.tflite, args.ticker.upper(), args.csv, args.start, args.end, args.buckets)
+    else:
+        exportar(args.models_dir, args.out or os.path.join(args.models_dir, 'lstm_model.npz'))
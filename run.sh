@@ -2,7 +2,13 @@
 
 # 1. Inicia a API (FastAPI) em background na porta 8000
 # O 'nohup' garante que ela não morra se o shell receber sinal
-nohup uvicorn src.app:app --host 0.0.0.0 --port 8000 > api.log 2>&1 &
+# Com API_WORKERS > 1 sobe N workers (SERVING_MODE=numpy) pinados em cores,
+# compartilhando os pesos via arquivo mapeado em memória
+if [ "${API_WORKERS:-1}" -gt 1 ]; then
+    nohup python -m src.serve --workers "$API_WORKERS" --host 0.0.0.0 --port 8000 > api.log 2>&1 &
+else
+    nohup uvicorn src.app:app --host 0.0.0.0 --port 8000 > api.log 2>&1 &
+fi
 
 echo "Aguardando API iniciar..."
 sleep 5
@@ -7,22 +7,63 @@ os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")
 load_dotenv()
 
 import numpy as np
-import joblib
-import tensorflow as tf
-import yfinance as yf
-import pandas as pd
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from typing import Annotated, Literal
 from contextlib import asynccontextmanager
 import logging
-import json
+import asyncio
+import hmac
+import time
 from datetime import datetime, timedelta
 from prometheus_fastapi_instrumentator import Instrumentator
-from sklearn.exceptions import InconsistentVersionWarning
-import requests
+
+from src.batching import MicroBatcher
+from src.config import (
+    ADMIN_TOKEN,
+    API_WORKERS,
+    BATCH_MAX_SIZE,
+    BATCH_MAX_WAIT_MS,
+    DATA_STORE_DIR,
+    DEFAULT_TICKER,
+    HORIZON_MAX_STEPS,
+    MARKET_DATA_BASE_URL,
+    MARKET_DATA_BREAKER_COOLDOWN_S,
+    MARKET_DATA_BREAKER_FAILURES,
+    MARKET_DATA_STALE_TTL_S,
+    MARKET_DATA_TIMEOUT_S,
+    MARKET_DATA_TTL_S,
+    MC_SAMPLES_MAX,
+    MODEL_REGISTRY_MEMORY_MB,
+    MODEL_WATCH_INTERVAL_S,
+    MODEL_WEIGHTS_MMAP,
+    PREDICT_BATCH_MAX_WINDOWS,
+    PREDICTION_CACHE_DECIMALS,
+    PREDICTION_CACHE_SIZE,
+    PREDICTION_CACHE_TTL_S,
+    PROFILER_ENABLED,
+    PROFILER_MAX_SECONDS,
+    SERVING_MODE,
+    STREAM_IDLE_TTL_S,
+    STREAM_MEMORY_MB,
+    WINDOW_SIZE,
+)
+from src.data_store import DataStore
+from src.market_data import CircuitBreaker, MarketDataClient
+from src.model_registry import ModelBundle, ModelRegistry, UnknownReleaseError, UnknownTickerError
+from src.prediction_cache import PredictionCache, window_key
+from src import profiler, wire_format
+from src.streaming import StreamSessionStore
+from src.uncertainty import summarize
+from src.windowing import count_windows, sliding_windows
 
 # https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol=PETR4.SA&apikey=IR9SKA9WD6LIKSVT_****
 # uvicorn src.app:app --reload --env-file .env --host 0.0.0.0 --port 8000
+# TensorFlow, joblib e sklearn são importados sob demanda: no SERVING_MODE=numpy
+# a API sobe só com NumPy (artefato gerado por `python exportar_modelo.py`).
 
 # --- Configuração de Logs (Requisito de Monitoramento) ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -32,7 +73,6 @@ warnings.filterwarnings(
     category=FutureWarning,
     message="In the future `np.object` will be defined as the corresponding NumPy scalar.",
 )
-warnings.filterwarnings("ignore", category=InconsistentVersionWarning)
 
 FALLBACK_DATA = [
     31.52, 31.64, 31.37, 31.04, 31.33, 31.95, 32.54, 32.32, 32.25, 31.84,
@@ -44,56 +84,64 @@ FALLBACK_DATA = [
 ]
 
 # --- Variáveis Globais ---
-# O modelo e o scaler ficam na memória RAM para acesso rápido
+# Registry de modelos por ticker (carregados sob demanda e mantidos em RAM) + batcher
 ml_models = {}
+# Cache de previsões por janela; a chave inclui ticker@versão do modelo
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_S)
+# Sessões de streaming: janela de 60 dias de cada cliente em ring buffer
+stream_sessions = StreamSessionStore(int(STREAM_MEMORY_MB * 1024 * 1024), STREAM_IDLE_TTL_S)
 
-def load_lstm_model(model_path: str):
-    if os.path.isdir(model_path):
-        config_path = os.path.join(model_path, "config.json")
-        weights_path = os.path.join(model_path, "model.weights.h5")
-        if not os.path.exists(config_path) or not os.path.exists(weights_path):
-            raise FileNotFoundError(
-                f"Arquivos do modelo não encontrados em {model_path}."
-            )
-        with open(config_path, "r", encoding="utf-8") as f:
-            config = json.load(f)
-        try:
-            deserializer = tf.keras.saving.deserialize_keras_object
-        except AttributeError:
-            from keras.saving import deserialize_keras_object as deserializer
-        model = deserializer(config)
-        model.load_weights(weights_path)
-        return model
-    return tf.keras.models.load_model(model_path)
+def _invalidate_predictions(bundle: ModelBundle):
+    """Nova versão carregada (hot-swap): descarta as previsões das versões antigas do ticker."""
+    removed = prediction_cache.invalidate(bundle.ticker, keep=bundle.tag)
+    if removed:
+        logger.info(f"🧹 Cache de previsões: {removed} entradas de versões antigas de {bundle.ticker} removidas.")
 
 # --- Ciclo de Vida (Lifespan) ---
 # Executa apenas UMA vez quando o servidor sobe
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Camada de dados de mercado (independe do modelo: sobe mesmo se ele falhar)
+    app.state.market_data = MarketDataClient(
+        api_key=os.getenv("ALPHAVANTAGE_API_KEY", "").strip(),
+        fallback=FALLBACK_DATA,
+        base_url=MARKET_DATA_BASE_URL,
+        ttl=MARKET_DATA_TTL_S,
+        stale_ttl=MARKET_DATA_STALE_TTL_S,
+        timeout=MARKET_DATA_TIMEOUT_S,
+        breaker=CircuitBreaker(MARKET_DATA_BREAKER_FAILURES, MARKET_DATA_BREAKER_COOLDOWN_S),
+        # Antes do FALLBACK_DATA fixo, tenta o histórico local (python coleta_dados.py)
+        history=DataStore(DATA_STORE_DIR).last_closes,
+    )
     try:
-        logger.info("🚀 Iniciando carregamento do modelo LSTM...")
+        logger.info(f"🚀 Iniciando carregamento do modelo LSTM (modo {SERVING_MODE})...")
         
         # Caminhos relativos a src/
         base_dir = os.path.dirname(os.path.abspath(__file__))
         models_dir = os.path.join(base_dir, "models")
-        model_path = os.path.join(models_dir, "lstm_model.keras")
-        scaler_x_path = os.path.join(models_dir, "scaler_X.pkl")
-        scaler_y_path = os.path.join(models_dir, "scaler_Y.pkl")
-
-        # Verificar se arquivos existem
-        if (
-            not os.path.exists(model_path)
-            or not os.path.exists(scaler_x_path)
-            or not os.path.exists(scaler_y_path)
-        ):
-            raise FileNotFoundError(
-                f"Arquivos não encontrados em {models_dir}. Verifique a pasta 'src/models'."
-            )
 
-        # Carregar artefatos
-        ml_models['model'] = load_lstm_model(model_path)
-        ml_models['scaler_X'] = joblib.load(scaler_x_path)
-        ml_models['scaler_Y'] = joblib.load(scaler_y_path)
+        # Registry: o ticker padrão é carregado já no startup, os demais sob demanda
+        registry = ModelRegistry(
+            models_dir,
+            default_ticker=DEFAULT_TICKER,
+            memory_budget_bytes=int(MODEL_REGISTRY_MEMORY_MB * 1024 * 1024),
+            serving_mode=SERVING_MODE,
+            mmap_path=MODEL_WEIGHTS_MMAP,
+            on_load=_invalidate_predictions,
+        )
+        registry.get(DEFAULT_TICKER)
+        ml_models['registry'] = registry
+
+        # Micro-batcher: agrupa janelas concorrentes em um só forward por modelo
+        ml_models['batcher'] = MicroBatcher(
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+        )
+        await ml_models['batcher'].start()
+
+        # Hot-swap: acompanha o arquivo ACTIVE de cada modelo residente
+        if MODEL_WATCH_INTERVAL_S > 0:
+            ml_models['watcher'] = asyncio.create_task(registry.watch(MODEL_WATCH_INTERVAL_S))
         
         logger.info("✅ Modelo e Scaler carregados com sucesso! API pronta.")
         yield
@@ -103,12 +151,17 @@ async def lifespan(app: FastAPI):
         ml_models['error'] = str(e)
         yield
     finally:
+        if 'watcher' in ml_models:
+            ml_models.pop('watcher').cancel()
+        if 'batcher' in ml_models:
+            await ml_models.pop('batcher').stop()
+        await app.state.market_data.aclose()
         logger.info("🛑 Desligando API e liberando recursos.")
 
 # --- Inicialização do App ---
 app = FastAPI(
     title="Tech Challenge Fase 4 - Forecast API",
-    description="API para previsão de preço de ações (PETR4) usando LSTM.",
+    description="API para previsão de preço de ações (PETR4 e outros tickers) usando LSTM.",
     version="1.0.0",
     lifespan=lifespan
 )
@@ -125,6 +178,40 @@ class StockInput(BaseModel):
         example=[30.0 + (i * 0.1) for i in range(60)] #fake 
     )
 
+Window = Annotated[list[float], Field(min_length=WINDOW_SIZE, max_length=WINDOW_SIZE)]
+
+class BatchInput(BaseModel):
+    """Lista de janelas prontas OU uma série longa + stride (o servidor monta as janelas)."""
+    windows: list[Window] | None = Field(
+        None,
+        description="Lista de janelas, cada uma com exatamente 60 preços de fechamento.",
+    )
+    series: list[float] | None = Field(
+        None,
+        min_length=WINDOW_SIZE,
+        description="Série contínua de preços; as janelas de 60 dias são geradas no servidor.",
+    )
+    stride: int = Field(1, ge=1, description="Passo entre janelas consecutivas (modo `series`).")
+
+    @model_validator(mode="after")
+    def check_mode(self):
+        if (self.windows is None) == (self.series is None):
+            raise ValueError("Informe exatamente um entre 'windows' e 'series'.")
+        if self.windows is not None and not self.windows:
+            raise ValueError("'windows' não pode ser vazio.")
+        n_windows = (
+            len(self.windows) if self.windows is not None
+            else count_windows(len(self.series), WINDOW_SIZE, self.stride)
+        )
+        if n_windows > PREDICT_BATCH_MAX_WINDOWS:
+            raise ValueError(
+                f"Lote com {n_windows} janelas excede o limite de {PREDICT_BATCH_MAX_WINDOWS}."
+            )
+        return self
+
+class TickInput(BaseModel):
+    close: float = Field(..., gt=0, description="Novo preço de fechamento do dia.")
+
 # ---Rotas ---
 
 @app.get("/health")
@@ -132,13 +219,120 @@ def health_check():
     """Verifica se a API e o modelo estão saudáveis"""
     if 'error' in ml_models:
         return {"status": "error", "detail": ml_models['error']}
+    registry = ml_models.get('registry')
+    resident = registry.resident() if registry is not None else []
+    default = next((b for b in resident if b.ticker == DEFAULT_TICKER), None)
     return {
         "status": "healthy", 
-        "model_loaded": (
-            'model' in ml_models and 'scaler_X' in ml_models and 'scaler_Y' in ml_models
-        )
+        "model_loaded": bool(resident),
+        "serving_mode": SERVING_MODE,
+        "model_version": default.version if default else None,
+        "model_release": default.release if default else None,
+        "inference_backend": getattr(default.model, 'name', None) if default else None,
+        "models": [describe_model(bundle) for bundle in resident],
+    }
+
+def describe_model(bundle: ModelBundle) -> dict:
+    return {
+        "ticker": bundle.ticker,
+        "version": bundle.version,
+        "release": bundle.release,
+        "loaded_at": datetime.fromtimestamp(bundle.loaded_at).isoformat(timespec="seconds"),
+        "load_seconds": round(bundle.load_seconds, 3),
+        "warmup_seconds": round(bundle.warmup_seconds, 3),
+        "mb": round(bundle.nbytes / (1024 * 1024), 2),
     }
 
+async def get_model(ticker: str) -> ModelBundle:
+    """Modelo do ticker; carrega fora do event loop se ainda não estiver na memória."""
+    registry = ml_models.get('registry')
+    if registry is None or 'batcher' not in ml_models:
+        raise HTTPException(status_code=503, detail="Modelo não está disponível no servidor.")
+    ticker = ticker.strip().upper()
+    bundle = registry.get_resident(ticker)
+    if bundle is not None:
+        return bundle
+    try:
+        return await run_in_threadpool(registry.get, ticker)
+    except UnknownTickerError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Falha ao carregar modelo de {ticker}: {e}")
+        raise HTTPException(status_code=503, detail=f"Modelo de {ticker} indisponível.")
+
+def _require_admin(token: str | None):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Endpoints admin desabilitados (defina ADMIN_TOKEN).")
+    if not hmac.compare_digest(token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Token admin inválido.")
+
+@app.post("/admin/models/{ticker}/reload")
+async def reload_model(
+    ticker: str,
+    version: str | None = Query(
+        None, description="Release em src/models/<TICKER>/versions/. Vazio = reler o ACTIVE."
+    ),
+    x_admin_token: Annotated[str | None, Header()] = None,
+):
+    """
+    Hot-swap: carrega e aquece a nova versão em background e troca a referência
+    sem derrubar o tráfego; requisições em andamento terminam na versão antiga.
+    """
+    _require_admin(x_admin_token)
+    registry = ml_models.get('registry')
+    if registry is None:
+        raise HTTPException(status_code=503, detail="Modelo não está disponível no servidor.")
+
+    ticker = ticker.strip().upper()
+    previous = registry.get_resident(ticker)
+    try:
+        bundle = await run_in_threadpool(registry.reload, ticker, version)
+    except (UnknownTickerError, UnknownReleaseError) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Falha no hot-swap de {ticker}: {e}")
+        raise HTTPException(status_code=500, detail=f"Falha ao carregar a nova versão de {ticker}; a atual foi mantida.")
+    return {
+        "status": "success",
+        "previous_version": previous.version if previous else None,
+        "previous_release": previous.release if previous else None,
+        "model": describe_model(bundle),
+    }
+
+@app.get("/admin/profile", response_class=PlainTextResponse)
+async def profile_live_traffic(
+    seconds: float = Query(10.0, gt=0, le=PROFILER_MAX_SECONDS, description="Duração da captura."),
+    interval_ms: float = Query(5.0, ge=1, le=100, description="Intervalo entre amostras."),
+    include_idle: bool = Query(False, description="Inclui threads ociosas (event loop/threadpool esperando)."),
+    x_admin_token: Annotated[str | None, Header()] = None,
+):
+    """
+    Amostra as pilhas Python de todas as threads durante `seconds` e devolve o
+    formato "folded" do flamegraph (ex.: `flamegraph.pl perfil.txt > perfil.svg`
+    ou arrastar no speedscope.app). Opt-in: exige PROFILER_ENABLED e ADMIN_TOKEN.
+    """
+    _require_admin(x_admin_token)
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=403, detail="Profiler desabilitado (defina PROFILER_ENABLED=true).")
+    try:
+        stacks, n_samples = await asyncio.to_thread(
+            profiler.sample, seconds, interval_ms / 1000, include_idle
+        )
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info(f"🔥 Profiling: {n_samples} amostras em {seconds:g}s, {len(stacks)} pilhas distintas.")
+    return PlainTextResponse(
+        profiler.render_folded(stacks),
+        headers={"X-Profile-Samples": str(n_samples), "X-Profile-Interval-Ms": f"{interval_ms:g}"},
+    )
+
+TickerQuery = Annotated[
+    str, Query(description="Ticker do modelo (ex.: PETR4.SA). Pasta src/models/<TICKER>/.")
+]
+OptionalTickerQuery = Annotated[
+    str | None, Query(description="Ticker do modelo; omitido, vale o da sessão (ou DEFAULT_TICKER).")
+]
+
 # @app.get("/sample-data")
 # def get_sample_data():
 #     """
@@ -186,99 +380,320 @@ def health_check():
 #         }
 
 @app.get("/sample-data")
-def get_sample_data_alpha():
+async def get_sample_data_alpha(request: Request):
     """
-    Busca dados diários.
+    Busca os últimos 60 fechamentos diários (Alpha Vantage, com cache; sem ele,
+    histórico local e por último o fallback fixo).
     """
-    symbol = "PETR4.SA"
-    api_key = os.getenv("ALPHAVANTAGE_API_KEY", "").strip()
-    if not api_key:
-        return {
-            "source": "alpha_vantage",
-            "error": "ALPHAVANTAGE_API_KEY não configurada.",
-            "last_60_days": FALLBACK_DATA,
-        }
+    return await request.app.state.market_data.get_last_closes("PETR4.SA")
 
-    url = (
-        "https://www.alphavantage.co/query"
-        f"?function=TIME_SERIES_DAILY&symbol={symbol}&apikey={api_key}"
-    )
+def _binary_body(schema: dict) -> dict:
+    """Documenta no OpenAPI os formatos aceitos por rotas que leem o corpo cru."""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                wire_format.JSON: {"schema": schema},
+                wire_format.OCTET_STREAM: {"schema": {"type": "string", "format": "binary"}},
+                wire_format.MSGPACK: {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    }
 
+async def _read_body(request: Request) -> tuple[bytes, str, str]:
+    """(corpo, formato da requisição, formato da resposta) pelo Content-Type/Accept."""
     try:
-        logger.info("Buscando dados no Alpha Vantage...")
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
-        payload = response.json()
-
-        series = payload.get("Time Series (Daily)")
-        if not series:
-            message = payload.get("Note") or payload.get("Error Message") or "Resposta inesperada."
-            raise ValueError(message)
-
-        # Ordena por data e pega os 60 últimos fechamentos ajustados
-        dates = sorted(series.keys())
-        last_60 = dates[-60:]
-        values = []
-        for date in last_60:
-            day = series[date]
-            close = day.get("4. close")
-            if close is None:
-                raise ValueError(f"Campo de preço ausente em {date}.")
-            values.append(round(float(close), 2))
-
-        if len(values) < 60:
-            raise ValueError(f"Dados insuficientes: {len(values)}")
+        fmt = wire_format.request_format(request.headers.get("content-type"))
+    except wire_format.UnsupportedMediaType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    return await request.body(), fmt, wire_format.response_format(request.headers.get("accept"))
 
-        return {
-            "source": "alpha_vantage",
-            "last_60_days": values,
-        }
+def _parse_json(schema: type[BaseModel], body: bytes):
+    try:
+        return schema.model_validate_json(body)
+    except ValidationError as e:
+        # Mesmo formato de erro 422 das rotas com corpo tipado
+        raise RequestValidationError(e.errors(include_url=False))
 
-    except Exception as e:
-        logger.warning(f"⚠️ Falha no Alpha Vantage ({e}). Usando fallback.")
-        return {
-            "source": "fallback_cached_data",
-            "note": "Alpha Vantage indisponível no momento. Usando dados recentes em cache.",
-            "last_60_days": FALLBACK_DATA,
-        }
+def _render(payload: dict, predictions, fmt: str, bundle: ModelBundle):
+    started = time.perf_counter()
+    if fmt == wire_format.JSON:
+        # Serializa aqui (e não no FastAPI) para o tempo entrar na etapa "encode"
+        response = JSONResponse(payload)
+    else:
+        try:
+            content = wire_format.encode_predictions(payload, predictions, fmt)
+        except wire_format.UnsupportedMediaType as e:
+            raise HTTPException(status_code=406, detail=str(e))
+        response = Response(
+            content,
+            media_type=fmt,
+            headers={"X-Ticker": payload["ticker"], "X-Count": str(np.size(predictions))},
+        )
+    bundle.stages["encode"](time.perf_counter() - started)
+    return response
 
-@app.post("/predict")
-def predict_price(input_data: StockInput):
-    """Recebe 60 dias de histórico e prevê o próximo dia"""
+@app.post("/predict", openapi_extra=_binary_body(StockInput.model_json_schema()))
+async def predict_price(
+    request: Request,
+    ticker: TickerQuery = DEFAULT_TICKER,
+    samples: int | None = Query(
+        None, ge=2, le=MC_SAMPLES_MAX,
+        description="MC dropout: k passadas com dropout ativo (média, desvio e quantis).",
+    ),
+):
+    """
+    Recebe 60 dias de histórico e prevê o próximo dia.
+    Aceita JSON (padrão), float32 LE cru (`application/octet-stream`) ou msgpack;
+    a resposta segue o header `Accept`. Com `samples=k`, devolve a incerteza
+    por MC dropout (em octet-stream, as k amostras cruas).
+    """
+    body, fmt, out_fmt = await _read_body(request)
     
-    # Validação de segurança
-    if (
-        'model' not in ml_models
-        or 'scaler_X' not in ml_models
-        or 'scaler_Y' not in ml_models
-    ):
-        raise HTTPException(status_code=503, detail="Modelo não está disponível no servidor.")
+    # Validação de segurança (e carga sob demanda do modelo do ticker)
+    bundle = await get_model(ticker)
+
+    # A. Preparar dados (60,): binário vai direto para np.frombuffer
+    started = time.perf_counter()
+    if fmt == wire_format.JSON:
+        window = np.asarray(_parse_json(StockInput, body).last_60_days, dtype=np.float64)
+    else:
+        try:
+            window = wire_format.decode_window(body, fmt)
+        except wire_format.UnsupportedMediaType as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        except wire_format.PayloadError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    bundle.stages["decode"](time.perf_counter() - started)
+
+    if samples is not None:
+        return await _predict_uncertainty(bundle, window, samples, out_fmt)
 
     try:
-        # A. Preparar dados
-        features = np.array(input_data.last_60_days).reshape(-1, 1) # (60, 1)
-        
-        # B. Normalizar (Usando o scaler treinado)
-        scaled_features = ml_models['scaler_X'].transform(features)
-        
-        # C. Formatar para LSTM (Batch, Steps, Features) -> (1, 60, 1)
-        final_input = scaled_features.reshape(1, 60, 1)
-        
-        # D. Previsão
-        prediction_scaled = ml_models['model'].predict(final_input, verbose=0)
-        
-        # E. Desnormalizar (Voltar para R$)
-        prediction_real = ml_models['scaler_Y'].inverse_transform(prediction_scaled)
-        result = float(prediction_real[0][0])
-        
-        logger.info(f"🔮 Previsão solicitada. Resultado: R$ {result:.2f}")
+        # B. Janela repetida? Devolve do cache sem passar pelo modelo
+        started = time.perf_counter()
+        cache_key = window_key(window, bundle.tag, PREDICTION_CACHE_DECIMALS)
+        result = prediction_cache.get(cache_key)
+        bundle.stages["cache"](time.perf_counter() - started)
+
+        # C. Normalizar + prever + desnormalizar em lote junto com outras requisições
+        if result is None:
+            result = await ml_models['batcher'].submit(window, bundle.predict_windows, bundle.labels)
+            prediction_cache.put(cache_key, result, bundle.tag)
         
-        return {
-            "ticker": "PETR4.SA",
+        logger.info(f"🔮 Previsão solicitada ({bundle.ticker}). Resultado: R$ {result:.2f}")
+
+    except Exception as e:
+        logger.error(f"Erro na inferência: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno no processamento do modelo.")
+
+    return _render(
+        {
+            "ticker": bundle.ticker,
             "predicted_price_brl": round(result, 2),
             "status": "success"
+        },
+        result,
+        out_fmt,
+        bundle,
+    )
+
+async def _predict_uncertainty(bundle: ModelBundle, window: np.ndarray, samples: int, out_fmt: str):
+    """MC dropout: as k amostras já formam um lote, então não passam pelo micro-batcher nem pelo cache."""
+    try:
+        predictions = await run_in_threadpool(bundle.sample_window, window, samples)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro na inferência (MC dropout): {e}")
+        raise HTTPException(status_code=500, detail="Erro interno no processamento do modelo.")
+
+    uncertainty = summarize(predictions)
+    logger.info(
+        f"🎲 Previsão com incerteza ({bundle.ticker}, {len(predictions)} amostras). "
+        f"Resultado: R$ {uncertainty['mean']:.2f} ± {uncertainty['std']:.2f}"
+    )
+    return _render(
+        {
+            "ticker": bundle.ticker,
+            "predicted_price_brl": uncertainty["mean"],
+            "uncertainty": {"samples": len(predictions), "samples_requested": samples, **uncertainty},
+            "status": "success",
+        },
+        predictions,
+        out_fmt,
+        bundle,
+    )
+
+@app.post("/predict/batch", openapi_extra=_binary_body(BatchInput.model_json_schema()))
+async def predict_price_batch(
+    request: Request,
+    ticker: TickerQuery = DEFAULT_TICKER,
+    layout: Literal["windows", "series"] = Query(
+        "windows", description="Só para octet-stream: janelas concatenadas ou série contínua."
+    ),
+    stride: int = Query(1, ge=1, description="Só para octet-stream com layout=series."),
+):
+    """
+    Prevê o próximo dia para N janelas em uma única chamada (backtests).
+    Aceita JSON (padrão), float32 LE cru (`application/octet-stream`) ou msgpack.
+    """
+    body, fmt, out_fmt = await _read_body(request)
+    bundle = await get_model(ticker)
+
+    started = time.perf_counter()
+    if fmt == wire_format.JSON:
+        input_data = _parse_json(BatchInput, body)
+        windows, series, stride = input_data.windows, input_data.series, input_data.stride
+    else:
+        try:
+            windows, series, stride = wire_format.decode_batch(body, fmt, layout, stride)
+        except wire_format.UnsupportedMediaType as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        except wire_format.PayloadError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    bundle.stages["decode"](time.perf_counter() - started)
+
+    try:
+        # Lote grande: roda no threadpool para não travar o event loop
+        predictions = await run_in_threadpool(_predict_batch, bundle, windows, series, stride)
+        logger.info(f"📦 Previsão em lote ({bundle.ticker}): {len(predictions)} janelas.")
+
+    except Exception as e:
+        logger.error(f"Erro na inferência em lote: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno no processamento do modelo.")
+
+    if out_fmt == wire_format.OCTET_STREAM:
+        return _render({"ticker": bundle.ticker}, predictions, out_fmt, bundle)
+    response = {
+        "ticker": bundle.ticker,
+        "count": int(len(predictions)),
+        "predicted_prices_brl": np.round(predictions, 2).tolist(),
+        "status": "success",
+    }
+    if series is not None:
+        response["window_end_indices"] = list(range(WINDOW_SIZE - 1, len(series), stride))
+    return _render(response, predictions, out_fmt, bundle)
+
+def _predict_batch(bundle: ModelBundle, windows, series, stride: int) -> np.ndarray:
+    if series is not None:
+        # Normaliza a série uma única vez e monta as janelas como view (zero-copy)
+        scaled_series = bundle.scale_series(series)
+        scaled_windows = sliding_windows(scaled_series, WINDOW_SIZE, stride)
+    else:
+        scaled_windows = bundle.scale_series(windows)
+    return bundle.forecast_scaled_chunked(scaled_windows)
+
+@app.post("/predict/horizon")
+async def predict_price_horizon(
+    input_data: StockInput,
+    steps: int = Query(5, ge=1, le=HORIZON_MAX_STEPS, description="Dias à frente (D+1 ... D+k)."),
+    ticker: TickerQuery = DEFAULT_TICKER,
+):
+    """
+    Previsão recursiva de k dias: cada previsão entra na janela para prever o
+    dia seguinte. Cada passo passa pelo micro-batcher, então requisições
+    concorrentes viram um único forward em lote por passo.
+    """
+    bundle = await get_model(ticker)
+
+    try:
+        # Buffer deslizante: janela inicial + espaço para as k previsões
+        buffer = np.empty(WINDOW_SIZE + steps, dtype=np.float64)
+        buffer[:WINDOW_SIZE] = input_data.last_60_days
+        for step in range(steps):
+            buffer[WINDOW_SIZE + step] = await ml_models['batcher'].submit(
+                buffer[step:step + WINDOW_SIZE], bundle.predict_windows, bundle.labels
+            )
+
+        path = buffer[WINDOW_SIZE:]
+        logger.info(f"🔭 Previsão de {steps} dias ({bundle.ticker}). D+{steps}: R$ {path[-1]:.2f}")
+        return {
+            "ticker": bundle.ticker,
+            "steps": steps,
+            "predicted_prices_brl": np.round(path, 2).tolist(),
+            "status": "success",
         }
 
     except Exception as e:
-        logger.error(f"Erro na inferência: {e}")
+        logger.error(f"Erro na inferência (horizonte): {e}")
         raise HTTPException(status_code=500, detail="Erro interno no processamento do modelo.")
+
+# --- Streaming: um fechamento por tick ---
+# As sessões vivem na memória do processo: com vários workers (src.serve ou
+# API_WORKERS > 1) cada tick cairia num worker diferente, então os endpoints
+# /stream/* exigem API_WORKERS=1 e respondem 503 caso contrário.
+
+def _require_single_worker():
+    if API_WORKERS > 1:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Streaming exige um único worker (API_WORKERS={API_WORKERS}): "
+                   "as sessões ficam na memória de cada processo.",
+        )
+
+async def _stream_forecast(session_id: str, session) -> dict:
+    """Prevê o próximo dia a partir da janela da sessão (chamar com session.lock)."""
+    bundle = await get_model(session.ticker)
+    window = session.window
+    response = {"session": session_id, "ticks": window.count}
+    if not window.ready:
+        response.update({
+            "status": "warming_up",
+            "missing": window.window_size - window.count,
+        })
+        return response
+    try:
+        result = await ml_models['batcher'].submit(window.view(), bundle.predict_windows, bundle.labels)
+    except Exception as e:
+        logger.error(f"Erro na inferência (stream {session_id}): {e}")
+        raise HTTPException(status_code=500, detail="Erro interno no processamento do modelo.")
+    response.update({
+        "ticker": bundle.ticker,
+        "predicted_price_brl": round(result, 2),
+        "status": "success",
+    })
+    return response
+
+@app.post("/stream/{session_id}")
+async def stream_start(session_id: str, input_data: StockInput, ticker: TickerQuery = DEFAULT_TICKER):
+    """
+    Abre (ou reinicia) uma sessão com os últimos 60 fechamentos e já devolve a previsão.
+    Requer API_WORKERS=1: as sessões não são compartilhadas entre processos.
+    """
+    _require_single_worker()
+    bundle = await get_model(ticker)
+    session = stream_sessions.reset(session_id, bundle.ticker)
+    async with session.lock:
+        session.window.extend(input_data.last_60_days)
+        return await _stream_forecast(session_id, session)
+
+@app.post("/stream/{session_id}/tick")
+async def stream_tick(session_id: str, tick: TickInput, ticker: OptionalTickerQuery = None):
+    """
+    Acrescenta um fechamento à janela da sessão e prevê o dia seguinte.
+    Sessões novas são criadas vazias (com `ticker`, padrão DEFAULT_TICKER) e passam
+    a prever após 60 ticks; numa sessão existente, um `ticker` diferente do dela
+    responde 409. Requer API_WORKERS=1, como o POST /stream/{session}.
+    """
+    _require_single_worker()
+    session = stream_sessions.get(session_id)
+    if session is None:
+        bundle = await get_model(ticker or DEFAULT_TICKER)
+        session = stream_sessions.get_or_create(session_id, bundle.ticker)
+    elif ticker is not None and ticker.strip().upper() != session.ticker:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Sessão {session_id} é de {session.ticker}, não de {ticker.strip().upper()}.",
+        )
+    async with session.lock:
+        session.window.push(tick.close)
+        return await _stream_forecast(session_id, session)
+
+@app.delete("/stream/{session_id}")
+def stream_close(session_id: str):
+    """Encerra a sessão e libera o buffer."""
+    _require_single_worker()
+    if not stream_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Sessão não encontrada.")
+    return {"session": session_id, "status": "closed"}
@@ -0,0 +1,253 @@
+import os
+
+# Paralelismo vem dos processos (um fold por worker), não das threads do BLAS.
+# Precisa ser definido antes do import do NumPy (vale também para os workers).
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+import argparse
+import logging
+import multiprocessing as mp
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.config import DEFAULT_TICKER, SERVING_MODE, WINDOW_SIZE
+from src.data_store import load_series
+from src.windowing import sliding_windows
+
+# --- Backtest walk-forward ---
+# Avalia o modelo servido (mesmo contrato da API: 60 fechamentos até D -> D+1)
+# fora da amostra, dividido em folds cronológicos consecutivos. Sem --start, os
+# alvos começam no corte de teste do src.train (70/15/15 sobre o histórico
+# completo): antes dele, as janelas foram vistas no treino/validação. Cada fold
+# roda em um processo: janelas via stride tricks + inferência em lote. As
+# métricas de todos os folds saem de uma única passada vetorizada.
+# Uso: python -m src.backtest --ticker PETR4.SA --folds 8 --workers 4
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("API_Petrobras")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+EPS = 1e-8  # evita divisão por zero no MAPE/sMAPE (mesmo valor do notebook)
+MODELS = ("LSTM", "Naive")
+
+
+def fold_bounds(n_targets: int, n_folds: int) -> np.ndarray:
+    """Limites [início, fim) de `n_folds` blocos consecutivos sobre os alvos."""
+    n_folds = max(1, min(n_folds, n_targets))
+    return np.linspace(0, n_targets, n_folds + 1).round().astype(int)
+
+
+def test_start(prices: pd.Series) -> pd.Timestamp:
+    """Data do primeiro alvo de teste do src.train sobre o mesmo histórico."""
+    from src.train import split_bounds
+
+    _, val_end = split_bounds(len(prices) - WINDOW_SIZE)
+    if val_end + WINDOW_SIZE >= len(prices):
+        raise ValueError(f"Histórico insuficiente para o split de teste: {len(prices)} dias.")
+    return prices.index[val_end + WINDOW_SIZE]
+
+
+# --- Workers ---
+
+_bundle = None
+
+
+def _init_worker(models_dir: str, ticker: str, serving_mode: str):
+    """Carrega o modelo uma vez por processo (runtime NumPy por padrão: sem TF)."""
+    global _bundle
+    from src.model_registry import ModelRegistry
+
+    registry = ModelRegistry(models_dir, ticker, memory_budget_bytes=0, serving_mode=serving_mode)
+    _bundle = registry.get(ticker)
+
+
+def _predict_fold(fold: int, segment: np.ndarray) -> tuple[int, np.ndarray]:
+    """
+    `segment` = 60 fechamentos antes do fold + os alvos do fold. A janela k
+    termina no dia anterior ao alvo k; a última linha do segmento é só alvo.
+    """
+    scaled = _bundle.scale_series(segment[:-1])
+    windows = sliding_windows(scaled, WINDOW_SIZE)
+    return fold, _bundle.forecast_scaled_chunked(windows)
+
+
+# --- Métricas ---
+
+def fold_metrics(
+    y_true: np.ndarray, predictions: dict[str, np.ndarray], bounds: np.ndarray
+) -> pd.DataFrame:
+    """
+    RMSE/MAE/MAPE/sMAPE/MASE por fold e modelo, via np.add.reduceat sobre os
+    limites dos folds (sem loop Python por ponto). MASE = MAE / MAE do Naive,
+    como no notebook.
+    """
+    starts, counts = bounds[:-1], np.diff(bounds)
+    rows = {}
+    for name, y_pred in predictions.items():
+        err = y_pred - y_true
+        abs_err = np.abs(err)
+        rows[name] = {
+            "rmse": np.sqrt(np.add.reduceat(err ** 2, starts) / counts),
+            "mae": np.add.reduceat(abs_err, starts) / counts,
+            "mape": np.add.reduceat(abs_err / (y_true + EPS), starts) / counts * 100,
+            "smape": np.add.reduceat(
+                2 * abs_err / (np.abs(y_true) + np.abs(y_pred) + EPS), starts
+            ) / counts * 100,
+        }
+    lstm_wins = np.abs(predictions["LSTM"] - y_true) <= np.abs(predictions["Naive"] - y_true)
+    win_rate = np.add.reduceat(lstm_wins.astype(np.float64), starts) / counts
+
+    frames = []
+    for name, metrics in rows.items():
+        frame = pd.DataFrame(metrics)
+        frame.insert(0, "model", name)
+        frame.insert(0, "fold", np.arange(len(starts)))
+        frame["mase"] = metrics["mae"] / rows["Naive"]["mae"]
+        frame["win_rate_r$"] = win_rate if name == "LSTM" else 1 - win_rate
+        frame["n"] = counts
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True).sort_values(["fold", "model"], ignore_index=True)
+
+
+def comparison_table(dates, y_true, y_lstm, y_naive, folds) -> pd.DataFrame:
+    """Tabela ponto a ponto do notebook (Err_*, AbsErr_*, Winner_R$, Winner_%) + fold."""
+    df = pd.DataFrame({
+        "Date": pd.to_datetime(dates),
+        "Fold": folds,
+        "Real": y_true,
+        "LSTM": y_lstm,
+        "Naive": y_naive,
+    })
+    df["Err_LSTM_R$"] = df["LSTM"] - df["Real"]
+    df["Err_Naive_R$"] = df["Naive"] - df["Real"]
+    df["Err_LSTM_%"] = df["Err_LSTM_R$"] / (df["Real"] + EPS) * 100.0
+    df["Err_Naive_%"] = df["Err_Naive_R$"] / (df["Real"] + EPS) * 100.0
+    df["AbsErr_LSTM_R$"] = df["Err_LSTM_R$"].abs()
+    df["AbsErr_Naive_R$"] = df["Err_Naive_R$"].abs()
+    df["AbsErr_LSTM_%"] = df["Err_LSTM_%"].abs()
+    df["AbsErr_Naive_%"] = df["Err_Naive_%"].abs()
+    df["Winner_R$"] = np.where(df["AbsErr_LSTM_R$"] <= df["AbsErr_Naive_R$"], "LSTM", "Naive")
+    df["Winner_%"] = np.where(df["AbsErr_LSTM_%"] <= df["AbsErr_Naive_%"], "LSTM", "Naive")
+    return df
+
+
+# --- Orquestração ---
+
+def run_backtest(
+    prices: pd.Series,
+    n_folds: int = 8,
+    workers: int = 1,
+    models_dir: str = MODELS_DIR,
+    ticker: str = DEFAULT_TICKER,
+    serving_mode: str = "numpy",
+    start: str | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Retorna (métricas por fold e modelo, tabela de comparação ponto a ponto).
+    `start` limita os alvos avaliados a partir de uma data; sem ela, vale o corte
+    de teste do src.train sobre `prices` (ver test_start). As janelas ainda usam
+    os 60 dias anteriores ao primeiro alvo.
+    """
+    values = prices.to_numpy(dtype=np.float64)
+    if start is None:
+        start = test_start(prices)
+    first_target = max(WINDOW_SIZE, int(prices.index.searchsorted(pd.Timestamp(start))))
+    n_targets = len(values) - first_target
+    if n_targets <= 0:
+        raise ValueError(f"Histórico insuficiente: {len(values)} dias para janelas de {WINDOW_SIZE}.")
+
+    bounds = fold_bounds(n_targets, n_folds)
+    segments = [
+        values[first_target + lo - WINDOW_SIZE:first_target + hi]
+        for lo, hi in zip(bounds[:-1], bounds[1:])
+    ]
+
+    started = time.perf_counter()
+    y_lstm = np.empty(n_targets, dtype=np.float64)
+    init_args = (models_dir, ticker, serving_mode)
+    if workers <= 1:
+        _init_worker(*init_args)
+        results = (_predict_fold(fold, segment) for fold, segment in enumerate(segments))
+        for fold, predictions in results:
+            y_lstm[bounds[fold]:bounds[fold + 1]] = predictions
+    else:
+        # spawn: o TensorFlow (serving_mode=tensorflow) não é fork-safe
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(segments)),
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=init_args,
+        ) as pool:
+            futures = [pool.submit(_predict_fold, fold, segment) for fold, segment in enumerate(segments)]
+            for future in futures:
+                fold, predictions = future.result()
+                y_lstm[bounds[fold]:bounds[fold + 1]] = predictions
+    logger.info(
+        f"⏱️ {n_targets} previsões em {len(segments)} folds "
+        f"({workers} worker(s)) em {time.perf_counter() - started:.2f}s."
+    )
+
+    y_true = values[first_target:]
+    # Naive: amanhã = hoje (último valor da janela)
+    y_naive = values[first_target - 1:-1]
+    folds = np.repeat(np.arange(len(segments)), np.diff(bounds))
+
+    metrics = fold_metrics(y_true, {"LSTM": y_lstm, "Naive": y_naive}, bounds)
+    dates = prices.index[first_target:]
+    metrics.insert(1, "start_date", dates[bounds[:-1]].repeat(len(MODELS)))
+    metrics.insert(2, "end_date", dates[bounds[1:] - 1].repeat(len(MODELS)))
+    return metrics, comparison_table(dates, y_true, y_lstm, y_naive, folds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest walk-forward do modelo LSTM vs Naive.")
+    parser.add_argument("--ticker", default=DEFAULT_TICKER)
+    parser.add_argument("--csv", default=None, help="Lê de um CSV em vez do store (data/store).")
+    parser.add_argument("--folds", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--start", default=None,
+        help="Primeira data avaliada (AAAA-MM-DD). Padrão: início do split de teste do src.train.",
+    )
+    parser.add_argument("--end", default=None, help="Última data avaliada (AAAA-MM-DD).")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument(
+        "--serving-mode", default="numpy" if SERVING_MODE == "tensorflow" else SERVING_MODE,
+        choices=("numpy", "tensorflow"),
+        help="numpy (lstm_model.npz, sem TF nos workers) ou tensorflow (.keras + .pkl).",
+    )
+    parser.add_argument("--out-dir", default=os.path.join("reports", "backtest"))
+    args = parser.parse_args()
+
+    if args.start is None:
+        # Mesmo histórico completo que o src.train usa para os cortes 70/15/15
+        args.start = str(test_start(load_series(args.ticker, args.csv)).date())
+        logger.info(f"📅 Avaliando a partir do split de teste: {args.start}")
+    # Só o intervalo pedido + os 60 pregões que formam as primeiras janelas
+    prices = load_series(args.ticker, args.csv, args.start, args.end, lookback=WINDOW_SIZE)
+    metrics, comparison = run_backtest(
+        prices,
+        n_folds=args.folds,
+        workers=args.workers,
+        models_dir=args.models_dir,
+        ticker=args.ticker,
+        serving_mode=args.serving_mode,
+        start=args.start,
+    )
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    metrics_path = os.path.join(args.out_dir, "folds.parquet")
+    comparison_path = os.path.join(args.out_dir, "comparison.parquet")
+    metrics.to_parquet(metrics_path, index=False)
+    comparison.to_parquet(comparison_path, index=False)
+
+    pd.set_option("display.width", 160)
+    print(metrics.to_string(index=False, float_format="%.4f"))
+    print("\nWinner_R$ por fold:")
+    print(pd.crosstab(comparison["Fold"], comparison["Winner_R$"], margins=True))
+    print(f"\n💾 {metrics_path}\n💾 {comparison_path}")
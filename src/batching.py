@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from typing import Callable
+
+import numpy as np
+
+from src.metrics import (
+    INFERENCE_BATCH_SIZE,
+    INFERENCE_BATCHES,
+    INFERENCE_QUEUE_DEPTH,
+    INFERENCE_QUEUE_WAIT,
+    INFERENCE_REQUEST_LATENCY,
+    INFERENCE_WINDOWS,
+)
+
+logger = logging.getLogger("API_Petrobras")
+
+
+class MicroBatcher:
+    """
+    Agrupa janelas de requisições concorrentes em um único forward do modelo.
+
+    Cada chamada a `submit` coloca a janela em uma fila asyncio; o dispatcher
+    junta até `max_batch_size` janelas ou espera no máximo `max_wait_ms`,
+    executa `predict_fn` uma vez (fora do event loop) e devolve a cada
+    chamador o seu próprio resultado.
+
+    A fila é compartilhada entre modelos: `submit` aceita o `predict_fn` do
+    modelo (ex.: ticker) desejado e cada lote é dividido em um forward por modelo.
+    `labels` (ticker, versão) rotulam as métricas de fila e de tamanho de lote.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray] | None = None,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._dispatch_loop())
+        logger.info(
+            f"Micro-batcher ativo (max_batch={self.max_batch_size}, "
+            f"max_wait={self.max_wait * 1000:.1f} ms)."
+        )
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Falha as requisições que ficaram na fila em vez de deixá-las penduradas
+        while self._queue is not None and not self._queue.empty():
+            _, _, _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher encerrado."))
+        INFERENCE_QUEUE_DEPTH.set(0)
+
+    async def submit(self, window: np.ndarray, predict_fn=None, labels: tuple[str, str] = ("", "")) -> float:
+        """Enfileira uma janela (60,) e aguarda a previsão correspondente."""
+        if self._queue is None or self._task is None:
+            raise RuntimeError("Micro-batcher não foi iniciado.")
+        predict_fn = predict_fn or self.predict_fn
+        if predict_fn is None:
+            raise ValueError("Nenhum predict_fn informado.")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((window, predict_fn, labels, future, time.perf_counter()))
+        INFERENCE_QUEUE_DEPTH.inc()
+        return await future
+
+    async def _collect_batch(self) -> list:
+        first = await self._queue.get()
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Drena o que já está na fila sem ceder o loop
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        INFERENCE_QUEUE_DEPTH.dec(len(batch))
+        return batch
+
+    async def _dispatch_loop(self):
+        while True:
+            batch = await self._collect_batch()
+            # Um forward por modelo, preservando a ordem de chegada dentro de cada grupo
+            groups: dict = {}
+            for item in batch:
+                groups.setdefault(item[1], []).append(item)
+            for predict_fn, group in groups.items():
+                await self._run_group(predict_fn, group)
+
+    async def _run_group(self, predict_fn, group: list):
+        loop = asyncio.get_running_loop()
+        windows = np.stack([item[0] for item in group])
+        labels = group[0][2]
+        queue_wait = INFERENCE_QUEUE_WAIT.labels(*labels)
+        started = time.perf_counter()
+        for item in group:
+            queue_wait.observe(started - item[4])
+        try:
+            # O forward roda no threadpool para não travar o event loop
+            predictions = await loop.run_in_executor(None, predict_fn, windows)
+        except (Exception, asyncio.CancelledError) as e:
+            for _, _, _, future, _ in group:
+                if not future.done():
+                    future.set_exception(
+                        RuntimeError("Micro-batcher encerrado.")
+                        if isinstance(e, asyncio.CancelledError) else e
+                    )
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+
+        INFERENCE_BATCHES.inc()
+        INFERENCE_WINDOWS.inc(len(group))
+        INFERENCE_BATCH_SIZE.labels(*labels).observe(len(group))
+        now = time.perf_counter()
+        for (_, _, _, future, enqueued_at), value in zip(group, predictions):
+            INFERENCE_REQUEST_LATENCY.observe(now - enqueued_at)
+            # O chamador pode ter desistido (timeout/disconnect)
+            if not future.done():
+                future.set_result(float(value))
@@ -0,0 +1,96 @@
+import os
+
+# --- Configuração via variáveis de ambiente ---
+# Todos os parâmetros de serving ficam centralizados aqui para que a API,
+# os scripts auxiliares e o Dockerfile compartilhem os mesmos defaults.
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name, "").strip()
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name, "").strip()
+    return float(value) if value else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name, "").strip().lower()
+    if not value:
+        return default
+    return value in ("1", "true", "yes", "on")
+
+
+# Histórico local em Parquet (src/data_store.py), particionado por ticker/ano
+DATA_STORE_DIR = os.getenv(
+    "DATA_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "store"),
+).strip()
+
+# Tamanho da janela de entrada do modelo (dias)
+WINDOW_SIZE = 60
+
+# Micro-batching do /predict: junta requisições concorrentes em um único forward
+BATCH_MAX_SIZE = env_int("BATCH_MAX_SIZE", 32)
+BATCH_MAX_WAIT_MS = env_float("BATCH_MAX_WAIT_MS", 5.0)
+
+# /predict/batch: limite de janelas por chamada e tamanho dos blocos de inferência
+PREDICT_BATCH_MAX_WINDOWS = env_int("PREDICT_BATCH_MAX_WINDOWS", 20000)
+PREDICT_CHUNK_SIZE = env_int("PREDICT_CHUNK_SIZE", 512)
+
+# Backend de inferência escolhido no startup: keras | tf_function | numpy
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "tf_function").strip().lower()
+
+# Modo de serving: tensorflow (.keras + .pkl) | numpy (artefato .npz, sem TF/sklearn)
+# | tflite (modelo quantizado em <models_dir>/tflite_<precisão>/, ver exportar_modelo.py)
+SERVING_MODE = os.getenv("SERVING_MODE", "tensorflow").strip().lower()
+TFLITE_PRECISION = os.getenv("TFLITE_PRECISION", "int8").strip().lower()
+TFLITE_THREADS = env_int("TFLITE_THREADS", 1)
+
+# Serving multi-processo (python -m src.serve): nº de workers, pinagem em cores e
+# arquivo de pesos mapeado em memória compartilhado entre os workers
+API_WORKERS = env_int("API_WORKERS", 1)
+API_PIN_CORES = env_bool("API_PIN_CORES", True)
+MODEL_WEIGHTS_MMAP = os.getenv("MODEL_WEIGHTS_MMAP", "").strip()
+
+# Dados de mercado (/sample-data): endpoint, cache TTL/stale-while-revalidate,
+# timeout e circuit breaker. A URL pode apontar para o stub local
+# (python -m src.market_data_stub) em testes e benchmarks.
+MARKET_DATA_BASE_URL = os.getenv("ALPHAVANTAGE_BASE_URL", "https://www.alphavantage.co/query").strip()
+MARKET_DATA_TTL_S = env_float("MARKET_DATA_TTL_S", 900.0)
+MARKET_DATA_STALE_TTL_S = env_float("MARKET_DATA_STALE_TTL_S", 86400.0)
+MARKET_DATA_TIMEOUT_S = env_float("MARKET_DATA_TIMEOUT_S", 15.0)
+MARKET_DATA_BREAKER_FAILURES = env_int("MARKET_DATA_BREAKER_FAILURES", 3)
+MARKET_DATA_BREAKER_COOLDOWN_S = env_float("MARKET_DATA_BREAKER_COOLDOWN_S", 60.0)
+
+# Cache de previsões do /predict (chave: hash da janela arredondada + versão do modelo)
+PREDICTION_CACHE_SIZE = env_int("PREDICTION_CACHE_SIZE", 4096)
+PREDICTION_CACHE_TTL_S = env_float("PREDICTION_CACHE_TTL_S", 3600.0)
+PREDICTION_CACHE_DECIMALS = env_int("PREDICTION_CACHE_DECIMALS", 4)
+
+# Streaming (/stream/{session}): teto de memória das sessões e expiração por ociosidade
+STREAM_MEMORY_MB = env_float("STREAM_MEMORY_MB", 64.0)
+STREAM_IDLE_TTL_S = env_float("STREAM_IDLE_TTL_S", 1800.0)
+
+# /predict/horizon: máximo de passos autoregressivos por chamada
+HORIZON_MAX_STEPS = env_int("HORIZON_MAX_STEPS", 20)
+
+# /predict?samples=k (MC dropout): teto de k e orçamento de latência do forward;
+# o k pedido é reduzido ao maior que cabe no orçamento (0 = só o teto)
+MC_SAMPLES_MAX = env_int("MC_SAMPLES_MAX", 256)
+MC_LATENCY_BUDGET_MS = env_float("MC_LATENCY_BUDGET_MS", 50.0)
+
+# Registry multi-ticker: modelos em src/models/<TICKER>/, carregados sob demanda.
+# O ticker padrão também usa os artefatos direto em src/models/ (layout original).
+DEFAULT_TICKER = os.getenv("DEFAULT_TICKER", "PETR4.SA").strip().upper()
+MODEL_REGISTRY_MEMORY_MB = env_float("MODEL_REGISTRY_MEMORY_MB", 512.0)
+
+# Hot-swap de modelos: intervalo (s) de checagem do arquivo ACTIVE (0 desativa)
+# e token exigido pelos endpoints /admin (vazio = endpoints desabilitados)
+MODEL_WATCH_INTERVAL_S = env_float("MODEL_WATCH_INTERVAL_S", 5.0)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "").strip()
+
+# Profiler por amostragem (/admin/profile): desligado por padrão; exige também ADMIN_TOKEN
+PROFILER_ENABLED = env_bool("PROFILER_ENABLED", False)
+PROFILER_MAX_SECONDS = env_float("PROFILER_MAX_SECONDS", 60.0)
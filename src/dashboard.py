@@ -3,6 +3,13 @@ import requests
 import pandas as pd
 import plotly.graph_objects as go
 import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from requests.adapters import HTTPAdapter
+from prometheus_client.parser import text_string_to_metric_families
 
 # Configuração da Página
 st.set_page_config(
@@ -25,40 +32,260 @@ st.sidebar.markdown(f"**Conectado em:** `{API_URL}` {status_color}")
 st.sidebar.header("Navegação")
 page = st.sidebar.radio("Ir para:", ["🔮 Simulador de Previsão", "📊 Monitoramento (Ops)"])
 
-def get_metrics():
-    try:
-        response = requests.get(f"{API_URL}/metrics")
-        return response.text
-    except:
-        return None
-
-def extract_metric_value(text, metric_name):
-    """
-    Função Robustecida:
-    1. Procura todas as linhas que começam com o nome da métrica.
-    2. Pega o último valor da linha (evita problemas com labels {}).
-    3. Soma tudo (ex: soma requisições do /predict + /metrics + /health).
-    """
-    total = 0.0
-    if text:
-        for line in text.split('\n'):
-            # Ignora comentários
-            if line.startswith('#'): continue
-            
-            # Se a linha começa com o nome da métrica
-            if line.startswith(metric_name):
-                try:
-                    # O valor numérico é sempre a última parte da string no formato Prometheus
-                    # Ex: http_requests_total{method="post"} 15.0
-                    value = float(line.split()[-1])
-                    total += value
-                except:
-                    pass
-    return total
+# --- Cliente HTTP da API ---
+# Uma sessão requests (pool keep-alive) por processo do Streamlit, compartilhada
+# entre reruns e usuários via st.cache_resource, sempre com timeout. Também
+# guarda a latência das últimas chamadas por rota (barra lateral) e roda as
+# previsões em background, para o gráfico não esperar pelo clique.
+API_TIMEOUT_S = float(os.getenv("DASHBOARD_API_TIMEOUT_S", "10"))
+SAMPLE_DATA_TTL_S = float(os.getenv("DASHBOARD_SAMPLE_DATA_TTL_S", "300"))
+PREDICTION_TTL_S = float(os.getenv("DASHBOARD_PREDICTION_TTL_S", "300"))
+LATENCY_HISTORY = 50       # chamadas por rota mantidas para a barra lateral
+PREFETCH_CACHE_SIZE = 64   # previsões (futures) guardadas por janela
+
+
+class ApiClient:
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.latencies = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="api-prefetch")
+        self._predictions = OrderedDict()  # janela -> (criado em, future)
+
+    def request(self, method, path, timeout=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self.session.request(method, f"{self.base_url}{path}", timeout=timeout or self.timeout, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.latencies.setdefault(f"{method} {path}", deque(maxlen=LATENCY_HISTORY)).append(elapsed_ms)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def predict(self, prices):
+        response = self.post("/predict", json={"last_60_days": list(prices)})
+        if response.status_code != 200:
+            raise RuntimeError(f"Erro na previsão: {response.text}")
+        return response.json()
+
+    def prefetch_prediction(self, prices):
+        """Future da previsão da janela: dispara em background ou reaproveita uma recente."""
+        key = tuple(prices)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._predictions.get(key)
+            # Futures que falharam ou venceram são refeitos
+            if cached is not None and now - cached[0] < PREDICTION_TTL_S and not (
+                cached[1].done() and cached[1].exception() is not None
+            ):
+                self._predictions.move_to_end(key)
+                return cached[1]
+            future = self._executor.submit(self.predict, key)
+            self._predictions[key] = (now, future)
+            while len(self._predictions) > PREFETCH_CACHE_SIZE:
+                self._predictions.popitem(last=False)
+            return future
+
+    def latency_table(self):
+        with self._lock:
+            snapshot = {route: list(values) for route, values in self.latencies.items()}
+        return pd.DataFrame([
+            {
+                "rota": route,
+                "última (ms)": values[-1],
+                "p50 (ms)": float(pd.Series(values).median()),
+                "n": len(values),
+            }
+            for route, values in sorted(snapshot.items())
+        ])
+
+
+@st.cache_resource
+def get_api_client():
+    return ApiClient(API_URL, API_TIMEOUT_S)
+
+
+@st.cache_data(ttl=SAMPLE_DATA_TTL_S, show_spinner=False)
+def fetch_sample_data():
+    """Últimos 60 fechamentos; reruns e outros usuários reaproveitam até o TTL vencer."""
+    response = get_api_client().get("/sample-data")
+    response.raise_for_status()
+    return response.json()
+
+
+# --- Ingestão de métricas (página Ops) ---
+# Uma thread por processo do Streamlit (st.cache_resource) lê o /metrics a cada
+# METRICS_INTERVAL_S, faz o parse do formato Prometheus uma única vez e guarda
+# só os agregados usados nos gráficos em um ring buffer (deque com maxlen).
+# As interações na página leem desse buffer, sem refazer a chamada à API.
+METRICS_INTERVAL_S = float(os.getenv("DASHBOARD_METRICS_INTERVAL_S", "5"))
+METRICS_HISTORY = int(os.getenv("DASHBOARD_METRICS_HISTORY", "720"))  # 1 h a cada 5 s
+METRICS_TIMEOUT_S = 3.0
+LATENCY_WINDOW_S = 60.0  # janela móvel dos percentis
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+@dataclass
+class MetricsSnapshot:
+    ts: float
+    requests: float                       # http_requests_total (sem o próprio /metrics)
+    latency_buckets: dict                 # le -> contagem acumulada (todas as rotas)
+    stage_buckets: dict                   # etapa -> {le -> contagem} (inference_stage_seconds)
+    rss_bytes: float
+    cpu_seconds: float
+
+
+def parse_metrics(text):
+    """Exposição Prometheus -> {nome da amostra: [(labels, valor)]} (nome exato, sem prefixo)."""
+    samples = {}
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            samples.setdefault(sample.name, []).append((sample.labels, sample.value))
+    return samples
+
+
+def metric_sum(samples, name, where=None):
+    return sum(value for labels, value in samples.get(name, []) if where is None or where(labels))
+
+
+def bucket_counts(samples, name, where=None):
+    """Soma os buckets de um histograma por `le` (agrega os demais labels)."""
+    buckets = {}
+    for labels, value in samples.get(name, []):
+        if where is None or where(labels):
+            le = float(labels["le"])
+            buckets[le] = buckets.get(le, 0.0) + value
+    return buckets
+
+
+def histogram_quantile(q, buckets):
+    """Mesma interpolação linear do histogram_quantile do PromQL."""
+    bounds = sorted(buckets)
+    if not bounds or buckets[bounds[-1]] <= 0:
+        return float("nan")
+    rank = q * buckets[bounds[-1]]
+    previous_bound, previous_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float("inf"):
+                return previous_bound
+            if count == previous_count:
+                return bound
+            return previous_bound + (bound - previous_bound) * (rank - previous_count) / (count - previous_count)
+        previous_bound, previous_count = bound, count
+    return previous_bound
+
+
+def bucket_delta(current, previous):
+    # Reinício do processo zera os contadores: usa o valor atual
+    return {le: (c - previous.get(le, 0.0)) if c >= previous.get(le, 0.0) else c for le, c in current.items()}
+
+
+class MetricsPoller:
+    def __init__(self, client, interval, history):
+        self.client = client
+        self.interval = interval
+        self.history = deque(maxlen=history)
+        self.latest_raw = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True, name="metrics-poller").start()
+
+    def _run(self):
+        while True:
+            self.poll()
+            time.sleep(self.interval)
+
+    def poll(self):
+        try:
+            response = self.client.get("/metrics", timeout=METRICS_TIMEOUT_S)
+            response.raise_for_status()
+            samples = parse_metrics(response.text)
+        except Exception as e:
+            self.last_error = str(e)
+            return
+        not_metrics = lambda labels: labels.get("handler") != "/metrics"
+        snapshot = MetricsSnapshot(
+            ts=time.time(),
+            requests=metric_sum(samples, "http_requests_total", not_metrics),
+            latency_buckets=bucket_counts(samples, "http_request_duration_highr_seconds_bucket"),
+            stage_buckets={
+                stage: bucket_counts(samples, "inference_stage_seconds_bucket", lambda l, s=stage: l.get("stage") == s)
+                for stage in {labels.get("stage") for labels, _ in samples.get("inference_stage_seconds_bucket", [])}
+            },
+            rss_bytes=metric_sum(samples, "process_resident_memory_bytes"),
+            cpu_seconds=metric_sum(samples, "process_cpu_seconds_total"),
+        )
+        with self._lock:
+            self.history.append(snapshot)
+            self.latest_raw = response.text
+            self.last_error = None
+
+    def snapshots(self):
+        with self._lock:
+            return list(self.history)
+
+    def timeseries(self):
+        """RPS, CPU, memória e percentis móveis de latência por ponto do histórico."""
+        history = self.snapshots()
+        window = max(1, int(round(LATENCY_WINDOW_S / self.interval)))
+        rows = []
+        for i in range(1, len(history)):
+            current, previous = history[i], history[i - 1]
+            elapsed = max(current.ts - previous.ts, 1e-9)
+            served = current.requests - previous.requests
+            cpu = current.cpu_seconds - previous.cpu_seconds
+            base = history[max(0, i - window)]
+            latency = bucket_delta(current.latency_buckets, base.latency_buckets)
+            row = {
+                "time": pd.Timestamp(current.ts, unit="s"),
+                "rps": (served if served >= 0 else current.requests) / elapsed,
+                "cpu_%": max(cpu, 0.0) / elapsed * 100,
+                "rss_mb": current.rss_bytes / 1024 / 1024,
+            }
+            for q in QUANTILES:
+                row[f"p{q * 100:g}_ms"] = histogram_quantile(q, latency) * 1000
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def stage_table(self):
+        """p50/p95 de cada etapa da inferência na janela móvel mais recente."""
+        history = self.snapshots()
+        if len(history) < 2:
+            return pd.DataFrame()
+        window = max(1, int(round(LATENCY_WINDOW_S / self.interval)))
+        current, base = history[-1], history[max(0, len(history) - 1 - window)]
+        rows = []
+        for stage, buckets in sorted(current.stage_buckets.items()):
+            delta = bucket_delta(buckets, base.stage_buckets.get(stage, {}))
+            rows.append({
+                "etapa": stage,
+                "chamadas": delta.get(float("inf"), 0.0),
+                "p50 (ms)": histogram_quantile(0.5, delta) * 1000,
+                "p95 (ms)": histogram_quantile(0.95, delta) * 1000,
+            })
+        return pd.DataFrame(rows)
+
+
+@st.cache_resource
+def get_metrics_poller():
+    return MetricsPoller(get_api_client(), METRICS_INTERVAL_S, METRICS_HISTORY)
 
 # --- PÁGINA 1: SIMULADOR ---
 if page == "🔮 Simulador de Previsão":
     st.header("Simulador de Inferência (LSTM)")
+    client = get_api_client()
     
     col1, col2 = st.columns([1, 3])
     
@@ -67,14 +294,14 @@ if page == "🔮 Simulador de Previsão":
         if st.button("🔄 Carregar Dados", use_container_width=True):
             with st.spinner("Buscando dados na API..."):
                 try:
-                    resp = requests.get(f"{API_URL}/sample-data")
-                    if resp.status_code == 200:
-                        data = resp.json()
-                        st.session_state['input_data'] = data['last_60_days']
-                        st.session_state['source'] = data.get('source', 'Unknown')
-                        st.success(f"Dados carregados! Fonte: {st.session_state['source']}")
-                    else:
-                        st.error("Erro ao buscar dados.")
+                    data = fetch_sample_data()
+                    st.session_state['input_data'] = data['last_60_days']
+                    st.session_state['source'] = data.get('source', 'Unknown')
+                    # Já dispara a previsão em background enquanto o gráfico é montado
+                    client.prefetch_prediction(data['last_60_days'])
+                    st.success(f"Dados carregados! Fonte: {st.session_state['source']}")
+                except requests.HTTPError:
+                    st.error("Erro ao buscar dados.")
                 except Exception as e:
                     st.error(f"API fora do ar: {e}")
 
@@ -87,26 +314,24 @@ if page == "🔮 Simulador de Previsão":
 
         if st.button("🚀 Realizar Previsão", type="primary", use_container_width=True):
             with st.spinner("Processando na Rede Neural..."):
-                payload = {"last_60_days": prices}
                 try:
-                    resp_pred = requests.post(f"{API_URL}/predict", json=payload)
-                    if resp_pred.status_code == 200:
-                        result = resp_pred.json()
-                        pred_price = result['predicted_price_brl']
-                        st.metric(label="Preço Previsto (D+1)", value=f"R$ {pred_price:.2f}")
-
-                        last_day = len(prices)
-                        fig.add_trace(go.Scatter(
-                            x=[last_day],
-                            y=[pred_price],
-                            mode='markers+text',
-                            marker=dict(color='red', size=15),
-                            text=[f"R$ {pred_price}"],
-                            textposition="top center",
-                            name='Previsão'
-                        ))
-                    else:
-                        st.error(f"Erro na previsão: {resp_pred.text}")
+                    # Normalmente já pronta (prefetch); senão espera no máximo o timeout
+                    result = client.prefetch_prediction(prices).result(timeout=API_TIMEOUT_S)
+                    pred_price = result['predicted_price_brl']
+                    st.metric(label="Preço Previsto (D+1)", value=f"R$ {pred_price:.2f}")
+
+                    last_day = len(prices)
+                    fig.add_trace(go.Scatter(
+                        x=[last_day],
+                        y=[pred_price],
+                        mode='markers+text',
+                        marker=dict(color='red', size=15),
+                        text=[f"R$ {pred_price}"],
+                        textposition="top center",
+                        name='Previsão'
+                    ))
+                except RuntimeError as e:
+                    st.error(str(e))
                 except Exception as e:
                     st.error(f"Erro de conexão: {e}")
 
@@ -115,38 +340,61 @@ if page == "🔮 Simulador de Previsão":
 # --- PÁGINA 2: MONITORAMENTO ---
 elif page == "📊 Monitoramento (Ops)":
     st.header("Monitoramento de Performance da API")
-    
+    poller = get_metrics_poller()
+
     if st.button("Atualizar Métricas"):
         st.rerun()
-        
-    raw_metrics = get_metrics()
-    
-    if raw_metrics:
-        # 1. Total de Requisições (Soma todas as rotas)
-        total_req = extract_metric_value(raw_metrics, 'http_requests_total')
-        
-        # 2. Latência (Soma dos tempos / Soma das contagens)
-        # Usamos 'highr' para alta precisão ou 'seconds' padrão
-        sum_lat = extract_metric_value(raw_metrics, 'http_request_duration_highr_seconds_sum')
-        count_lat = extract_metric_value(raw_metrics, 'http_request_duration_highr_seconds_count')
-        
-        # Evita divisão por zero
-        avg_latency = (sum_lat / count_lat) if count_lat > 0 else 0
-        
-        # 3. Métricas de Sistema (CPU e RAM)
-        cpu_usage = extract_metric_value(raw_metrics, 'process_cpu_seconds_total')
-        
-        # RAM vem em Bytes -> Converter para MB
-        mem_usage = extract_metric_value(raw_metrics, 'process_resident_memory_bytes') / 1024 / 1024 
-        
+
+    history = poller.snapshots()
+    if history:
+        series = poller.timeseries()
+        latest = history[-1]
+        recent = series.iloc[-1] if not series.empty else None
+
         c1, c2, c3, c4 = st.columns(4)
-        c1.metric("Requisições Totais", f"{int(total_req)}")
-        c2.metric("Latência Média", f"{avg_latency:.4f} s")
-        c3.metric("CPU Time (s)", f"{cpu_usage:.2f}")
-        c4.metric("Uso de RAM", f"{mem_usage:.1f} MB")
-        
+        c1.metric("Requisições Totais", f"{int(latest.requests)}")
+        c2.metric("RPS (últimos pontos)", f"{recent['rps']:.1f}" if recent is not None else "-")
+        c3.metric(
+            f"Latência p99 ({LATENCY_WINDOW_S:.0f}s)",
+            f"{recent['p99_ms']:.1f} ms" if recent is not None and recent["p99_ms"] == recent["p99_ms"] else "-",
+        )
+        c4.metric("Uso de RAM", f"{latest.rss_bytes / 1024 / 1024:.1f} MB")
+
+        if poller.last_error:
+            st.warning(f"⚠️ Última coleta falhou: {poller.last_error}")
+        st.caption(
+            f"Coleta a cada {METRICS_INTERVAL_S:g}s em background; {len(history)} de {METRICS_HISTORY} pontos em memória."
+        )
+
+        if not series.empty:
+            series = series.set_index("time")
+            st.subheader("Requisições por segundo (sem o /metrics)")
+            st.line_chart(series[["rps"]])
+            st.subheader(f"Latência HTTP (percentis móveis de {LATENCY_WINDOW_S:.0f}s, ms)")
+            st.line_chart(series[[f"p{q * 100:g}_ms" for q in QUANTILES]])
+            col_mem, col_cpu = st.columns(2)
+            with col_mem:
+                st.subheader("Memória (RSS, MB)")
+                st.line_chart(series[["rss_mb"]])
+            with col_cpu:
+                st.subheader("CPU (%)")
+                st.line_chart(series[["cpu_%"]])
+
+        stages = poller.stage_table()
+        if not stages.empty:
+            st.subheader("Etapas da inferência")
+            st.dataframe(stages, hide_index=True, use_container_width=True)
+
         st.subheader("Log Bruto do Prometheus")
         with st.expander("Ver detalhes técnicos"):
-            st.code(raw_metrics)
+            st.code(poller.latest_raw)
+    elif poller.last_error:
+        st.warning(f"⚠️ Não foi possível conectar ao endpoint /metrics: {poller.last_error}")
     else:
-        st.warning("⚠️ Não foi possível conectar ao endpoint /metrics")
+        st.info("⏳ Coletando as primeiras métricas...")
+
+# Latência das chamadas à API feitas por este processo do dashboard
+latencies = get_api_client().latency_table()
+if not latencies.empty:
+    st.sidebar.header("Latência da API")
+    st.sidebar.dataframe(latencies, hide_index=True, use_container_width=True)
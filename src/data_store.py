@@ -0,0 +1,295 @@
+import logging
+import os
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Callable
+
+from src.config import DATA_STORE_DIR, DEFAULT_TICKER
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# --- Histórico local em Parquet ---
+# Um arquivo por ticker e ano (layout hive: <raiz>/ticker=PETR4.SA/year=2024/part.parquet).
+# - Coleta incremental: só as datas após a última gravada; o ffill da borda
+#   usa a última linha já salva, e só os anos tocados são regravados.
+# - Leitura com pushdown: os anos fora do intervalo nem são abertos e o filtro
+#   de data vai para o leitor do Arrow (estatísticas dos row groups).
+# - Treino, backtest, tuning e o /sample-data leem daqui. O CSV antigo do
+#   coleta_dados.py ainda é aceito (--csv) e pode ser importado (--from-csv),
+#   o que permite montar o store a partir de fixtures, sem rede.
+# pandas/pyarrow são importados sob demanda: a API no SERVING_MODE=numpy só
+# os carrega se o /sample-data precisar cair para o store.
+
+logger = logging.getLogger("API_Petrobras")
+
+COLUMNS = ("Open", "High", "Low", "Close", "Adj Close", "Volume")
+START_DATE = "2018-01-01"
+PARTITION_FILE = "part.parquet"
+
+
+def _flatten(df: "pd.DataFrame", symbol: str) -> "pd.DataFrame":
+    """Colunas simples (Close, Adj Close, ...) a partir do MultiIndex do yfinance novo."""
+    if df.columns.nlevels > 1:
+        tickers = df.columns.get_level_values(1)
+        df = df.xs(symbol, level=1, axis=1) if symbol in tickers else df.droplevel(1, axis=1)
+    return df
+
+
+def normalize(df: "pd.DataFrame", symbol: str) -> "pd.DataFrame":
+    """
+    Esquema fixo do store: índice Date (sem fuso, ordenado e único) e COLUMNS em
+    float64. Sem "Adj Close" (yfinance com auto_adjust) o Close já é ajustado.
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = _flatten(df, symbol).copy()
+    df.index = pd.to_datetime(df.index).tz_localize(None).normalize()
+    df.index.name = "Date"
+    if "Adj Close" not in df.columns and "Close" in df.columns:
+        df["Adj Close"] = df["Close"]
+    df = df.reindex(columns=list(COLUMNS)).astype(np.float64)
+    return df[~df.index.duplicated(keep="last")].sort_index()
+
+
+def read_csv(csv_path: str, symbol: str = DEFAULT_TICKER) -> "pd.DataFrame":
+    """CSV do coleta_dados.py (cabeçalho simples ou o MultiIndex das versões novas do yfinance)."""
+    import pandas as pd
+
+    with open(csv_path, "r", encoding="utf-8") as f:
+        second_line = (f.readline(), f.readline())[1]
+    if second_line.startswith("Ticker"):
+        df = pd.read_csv(csv_path, header=[0, 1], index_col=0, skiprows=[2])
+    else:
+        df = pd.read_csv(csv_path, index_col=0)
+    return normalize(df, symbol)
+
+
+def load_prices(csv_path: str, symbol: str = DEFAULT_TICKER) -> "pd.Series":
+    """Série de fechamentos ajustados indexada por data, lida de um CSV."""
+    return read_csv(csv_path, symbol)["Adj Close"].ffill().dropna()
+
+
+def yfinance_download(symbol: str, start: str, end: str | None) -> "pd.DataFrame":
+    import yfinance as yf
+
+    # auto_adjust=False: mantém Close e Adj Close separados (alvo do modelo = Adj Close)
+    return yf.download(symbol, start=start, end=end, auto_adjust=False, progress=False)
+
+
+class DataStore:
+    def __init__(self, root: str = DATA_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        # last_closes: (ticker, n) -> (mtime do último ano, valores)
+        self._recent: dict[tuple[str, int], tuple[int, list[float]]] = {}
+
+    def ticker_dir(self, ticker: str) -> str:
+        return os.path.join(self.root, f"ticker={ticker.upper()}")
+
+    def _partition_path(self, ticker: str, year: int) -> str:
+        return os.path.join(self.ticker_dir(ticker), f"year={year}", PARTITION_FILE)
+
+    def tickers(self) -> list[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name.split("=", 1)[1] for name in os.listdir(self.root) if name.startswith("ticker=")
+        )
+
+    def years(self, ticker: str) -> list[int]:
+        ticker_dir = self.ticker_dir(ticker)
+        if not os.path.isdir(ticker_dir):
+            return []
+        return sorted(
+            int(name.split("=", 1)[1])
+            for name in os.listdir(ticker_dir)
+            if name.startswith("year=") and os.path.isfile(os.path.join(ticker_dir, name, PARTITION_FILE))
+        )
+
+    # --- Leitura ---
+
+    def read(
+        self,
+        ticker: str,
+        start: str | date | None = None,
+        end: str | date | None = None,
+        columns: list[str] | None = None,
+    ) -> "pd.DataFrame":
+        """Linhas com start <= Date <= end; só os anos do intervalo são lidos."""
+        import pandas as pd
+        import pyarrow.dataset as ds
+
+        columns = list(COLUMNS if columns is None else columns)
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        files = [
+            self._partition_path(ticker, year)
+            for year in self.years(ticker)
+            if (start is None or year >= start.year) and (end is None or year <= end.year)
+        ]
+        if not files:
+            return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name="Date"))
+
+        condition = None
+        if start is not None:
+            condition = ds.field("Date") >= start.to_pydatetime()
+        if end is not None:
+            upper = ds.field("Date") <= end.to_pydatetime()
+            condition = upper if condition is None else condition & upper
+        table = ds.dataset(files, format="parquet").to_table(
+            columns=["Date", *columns], filter=condition
+        )
+        return table.to_pandas().set_index("Date").sort_index()
+
+    def closes(
+        self,
+        ticker: str,
+        start: str | date | None = None,
+        end: str | date | None = None,
+        lookback: int = 0,
+    ) -> "pd.Series":
+        """
+        Fechamentos ajustados de `ticker`. `lookback` inclui também os N pregões
+        anteriores a `start` (ex.: as 60 primeiras janelas de um backtest).
+        """
+        import pandas as pd
+
+        read_start = start
+        if start is not None and lookback:
+            # N pregões cabem com folga em 2N + 30 dias corridos (feriados longos)
+            read_start = pd.Timestamp(start) - timedelta(days=2 * lookback + 30)
+        series = self.read(ticker, read_start, end, columns=["Adj Close"])["Adj Close"].ffill().dropna()
+        if start is not None:
+            first = max(0, int(series.index.searchsorted(pd.Timestamp(start))) - lookback)
+            series = series.iloc[first:]
+        if series.empty:
+            raise LookupError(f"Sem histórico de {ticker} no store ({self.root}).")
+        return series
+
+    def last_date(self, ticker: str) -> "pd.Timestamp | None":
+        years = self.years(ticker)
+        if not years:
+            return None
+        dates = self.read(ticker, start=f"{years[-1]}-01-01", columns=[]).index
+        return dates[-1] if len(dates) else None
+
+    def last_closes(self, ticker: str, n_days: int = 60) -> list[float] | None:
+        """
+        Últimos `n_days` fechamentos (arredondados como no Alpha Vantage) ou None.
+        Cacheado pelo mtime do último ano: o /sample-data não relê o disco à toa.
+        """
+        ticker = ticker.upper()
+        years = self.years(ticker)
+        if not years:
+            return None
+        mtime = os.stat(self._partition_path(ticker, years[-1])).st_mtime_ns
+        cached = self._recent.get((ticker, n_days))
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            # 2 anos cobrem 60 pregões mesmo no início de janeiro
+            series = self.read(ticker, start=f"{years[-1] - 1}-01-01", columns=["Adj Close"])["Adj Close"]
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao ler o histórico local de {ticker}: {e}")
+            return None
+        series = series.ffill().dropna()
+        if len(series) < n_days:
+            return None
+        values = [round(float(v), 2) for v in series.iloc[-n_days:]]
+        self._recent[(ticker, n_days)] = (mtime, values)
+        return values
+
+    # --- Escrita ---
+
+    def append(self, ticker: str, df: "pd.DataFrame") -> int:
+        """
+        Acrescenta as linhas posteriores à última data gravada (as demais são
+        ignoradas) e devolve quantas entraram. Os NaN do início do bloco novo
+        são preenchidos com a última linha salva.
+        """
+        import pandas as pd
+
+        ticker = ticker.upper()
+        with self._lock:
+            new = normalize(df, ticker)
+            last = self.last_date(ticker)
+            if last is not None:
+                new = new[new.index > last]
+            if new.empty:
+                return 0
+            if last is not None:
+                boundary = self.read(ticker, start=last, end=last)
+                new = pd.concat([boundary, new]).ffill().iloc[1:]
+            else:
+                new = new.ffill()
+
+            for year, rows in new.groupby(new.index.year):
+                path = self._partition_path(ticker, int(year))
+                if os.path.exists(path):
+                    rows = pd.concat([self.read(ticker, f"{year}-01-01", f"{year}-12-31"), rows])
+                self._write_partition(path, rows)
+            logger.info(
+                f"💾 {ticker}: +{len(new)} pregões ({new.index[0].date()} a {new.index[-1].date()})."
+            )
+            return len(new)
+
+    @staticmethod
+    def _write_partition(path: str, rows: "pd.DataFrame"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(rows.reset_index(), preserve_index=False)
+        # Escreve ao lado e troca atomicamente: leitores nunca veem arquivo parcial
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+
+    def import_csv(self, csv_path: str, ticker: str) -> int:
+        return self.append(ticker, read_csv(csv_path, ticker))
+
+    def fetch(
+        self,
+        ticker: str,
+        end: str | None = None,
+        download: Callable[[str, str, str | None], "pd.DataFrame"] = yfinance_download,
+    ) -> int:
+        """
+        Baixa só o que falta (da última data gravada + 1 até `end`, exclusivo
+        como no yfinance) e acrescenta ao store.
+        """
+        ticker = ticker.upper()
+        last = self.last_date(ticker)
+        start = (last + timedelta(days=1)).strftime("%Y-%m-%d") if last is not None else START_DATE
+        if last is not None and start >= (end or (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")):
+            logger.info(f"✅ {ticker} já atualizado até {last.date()}.")
+            return 0
+        logger.info(f"⬇️ Baixando {ticker} a partir de {start}...")
+        df = download(ticker, start, end)
+        if df is None or df.empty:
+            if last is None:
+                raise LookupError(f"Nenhum dado baixado para {ticker}. Verifique o símbolo ou a conexão.")
+            logger.info(f"✅ Nenhum pregão novo para {ticker} após {last.date()}.")
+            return 0
+        return self.append(ticker, df)
+
+
+def load_series(
+    ticker: str,
+    csv_path: str | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    lookback: int = 0,
+    store: DataStore | None = None,
+) -> "pd.Series":
+    """Fechamentos ajustados do store (padrão) ou de um CSV explícito."""
+    if csv_path:
+        prices = load_prices(csv_path, ticker)
+        if start is not None:
+            first = max(0, int(prices.index.searchsorted(start)) - lookback)
+            prices = prices.iloc[first:]
+        return prices[:end] if end is not None else prices
+    return (store or DataStore()).closes(ticker, start, end, lookback)
@@ -0,0 +1,338 @@
+import json
+import logging
+import os
+import threading
+import time
+import warnings
+from functools import cached_property
+
+import numpy as np
+
+from src.config import BATCH_MAX_SIZE, WINDOW_SIZE
+from src.lstm_numpy import MinMaxParams, NumpyLSTM, save_npz
+
+logger = logging.getLogger("API_Petrobras")
+
+# --- Backends de inferência ---
+# Todos expõem `predict(x)` com x (N, 60, 1) float32 -> (N, 1), e `name`.
+# `sample(x, rng)` faz o mesmo com o dropout ativo (MC dropout): cada linha do
+# lote é uma amostra independente. `rng` só é usado pelo runtime NumPy.
+# TensorFlow só é importado pelos backends que precisam dele, para que o modo
+# NumPy (SERVING_MODE=numpy) suba sem carregar o runtime TF.
+
+
+class KerasBackend:
+    """`model.predict` padrão do Keras (monta data adapter + loop a cada chamada)."""
+
+    name = "keras"
+
+    def __init__(self, model):
+        self.model = model
+
+    @property
+    def nbytes(self) -> int:
+        return self.model.count_params() * 4
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        return self.model.predict(x, batch_size=max(len(x), 1), verbose=0)
+
+    def sample(self, x: np.ndarray, rng=None) -> np.ndarray:
+        return np.asarray(self.model(x, training=True))
+
+
+class TFFunctionBackend:
+    """Grafo `tf.function` com assinatura fixa, compilado uma vez e chamado direto."""
+
+    name = "tf_function"
+
+    def __init__(self, model):
+        import tensorflow as tf
+
+        self._tf = tf
+        self.model = model
+        self._fn = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec([None, WINDOW_SIZE, 1], tf.float32)],
+            reduce_retracing=True,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.model.count_params() * 4
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        return self._fn(self._tf.convert_to_tensor(x, dtype=self._tf.float32)).numpy()
+
+    @cached_property
+    def _sample_fn(self):
+        # Segundo grafo (training=True): compilado só na primeira chamada com samples
+        tf = self._tf
+        model = self.model
+        return tf.function(
+            lambda x: model(x, training=True),
+            input_signature=[tf.TensorSpec([None, WINDOW_SIZE, 1], tf.float32)],
+            reduce_retracing=True,
+        )
+
+    def sample(self, x: np.ndarray, rng=None) -> np.ndarray:
+        return self._sample_fn(self._tf.convert_to_tensor(x, dtype=self._tf.float32)).numpy()
+
+
+class NumpyBackend:
+    """Forward da LSTM empilhada em NumPy puro, sem overhead do runtime TF."""
+
+    name = "numpy"
+
+    def __init__(self, runtime: NumpyLSTM):
+        self.runtime = runtime
+
+    @property
+    def nbytes(self) -> int:
+        return self.runtime.nbytes
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        return self.runtime.predict(x)
+
+    def sample(self, x: np.ndarray, rng=None) -> np.ndarray:
+        return self.runtime.predict(x, rng if rng is not None else np.random.default_rng())
+
+
+class TFLiteBackend:
+    """
+    Modelo quantizado (int8/float16) no interpretador TFLite.
+
+    A LSTM só converte com batch estático, então o export gera um .tflite por
+    bucket (1, 2, 4, ... BATCH_MAX_SIZE): cada lote vai para o menor bucket que
+    o comporta (completado com zeros) e lotes maiores são divididos no maior.
+    Interpretadores não são thread-safe: cada thread cria, na primeira chamada,
+    os seus (um por bucket, tensores já alocados) e reaproveita nas seguintes.
+    """
+
+    name = "tflite"
+
+    def __init__(self, models: dict[int, bytes], precision: str, threads: int = 1):
+        self._interpreter_cls = tflite_interpreter_class()
+        self.models = dict(sorted(models.items()))
+        self.buckets = tuple(self.models)
+        self.precision = precision
+        self.threads = threads
+        self._local = threading.local()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(content) for content in self.models.values())
+
+    def _interpreter(self, bucket: int):
+        interpreters = getattr(self._local, "interpreters", None)
+        if interpreters is None:
+            interpreters = self._local.interpreters = {}
+        entry = interpreters.get(bucket)
+        if entry is None:
+            with warnings.catch_warnings():
+                # tf.lite.Interpreter avisa que foi movido para o ai_edge_litert
+                warnings.simplefilter("ignore")
+                interpreter = self._interpreter_cls(model_content=self.models[bucket], num_threads=self.threads)
+            interpreter.allocate_tensors()
+            entry = (
+                interpreter,
+                interpreter.get_input_details()[0]["index"],
+                interpreter.get_output_details()[0]["index"],
+                np.zeros((bucket, WINDOW_SIZE, 1), dtype=np.float32),
+            )
+            interpreters[bucket] = entry
+        return entry
+
+    def _invoke(self, x: np.ndarray) -> np.ndarray:
+        n = len(x)
+        bucket = next(b for b in self.buckets if b >= n)
+        interpreter, input_index, output_index, padded = self._interpreter(bucket)
+        if n == bucket:
+            interpreter.set_tensor(input_index, x)
+        else:
+            padded[:n] = x
+            padded[n:] = 0.0
+            interpreter.set_tensor(input_index, padded)
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index)[:n].copy()
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        largest = self.buckets[-1]
+        if len(x) <= largest:
+            return self._invoke(x)
+        return np.concatenate([self._invoke(x[i:i + largest]) for i in range(0, len(x), largest)])
+
+    def sample(self, x: np.ndarray, rng=None) -> np.ndarray:
+        raise NotImplementedError("O export TFLite remove o dropout: MC dropout indisponível neste modo.")
+
+
+BACKENDS = ("keras", "tf_function", "numpy")
+
+
+def warmup(backend, batch_sizes=None):
+    """
+    Executa forwards descartáveis para pagar trace/alocações no startup
+    (no TFLite, um por bucket: aloca os interpretadores da thread que carregou).
+    """
+    for batch_size in batch_sizes or getattr(backend, "buckets", (1, BATCH_MAX_SIZE)):
+        backend.predict(np.zeros((batch_size, WINDOW_SIZE, 1), dtype=np.float32))
+
+
+def create_backend(model, name: str = "tf_function", warm: bool = True):
+    """Instancia e aquece o backend pedido; se não for suportado, cai para tf_function."""
+    if name not in BACKENDS:
+        raise ValueError(f"Backend de inferência inválido: {name}. Opções: {BACKENDS}")
+
+    if name == "numpy":
+        try:
+            backend = NumpyBackend(NumpyLSTM.from_keras(model))
+        except NotImplementedError as e:
+            logger.warning(f"⚠️ Runtime NumPy indisponível ({e}). Usando tf_function.")
+            backend = TFFunctionBackend(model)
+    elif name == "tf_function":
+        backend = TFFunctionBackend(model)
+    else:
+        backend = KerasBackend(model)
+
+    if warm:
+        warmup(backend)
+    return backend
+
+
+def export_npz(model, scaler_x, scaler_y, out_path: str):
+    """
+    Converte modelo Keras + scalers sklearn no artefato .npz do runtime NumPy.
+    Só o export precisa de TensorFlow/joblib; o serving lê o .npz com NumPy puro.
+    """
+    runtime = NumpyLSTM.from_keras(model)
+    save_npz(
+        out_path,
+        runtime,
+        MinMaxParams.from_sklearn(scaler_x),
+        MinMaxParams.from_sklearn(scaler_y),
+    )
+    return runtime
+
+
+# --- Export quantizado (SERVING_MODE=tflite) ---
+# Diretório <models_dir>/tflite_<precisão>/ com batch_<n>.tflite por bucket,
+# manifest.json (precisão, buckets e scalers) e drift_report.json.
+
+TFLITE_PRECISIONS = ("int8", "float16", "float32")
+TFLITE_MANIFEST = "manifest.json"
+
+
+def tflite_dir(models_dir: str, precision: str) -> str:
+    return os.path.join(models_dir, f"tflite_{precision}")
+
+
+def tflite_buckets(max_batch: int = BATCH_MAX_SIZE) -> tuple[int, ...]:
+    """Potências de 2 até `max_batch` (inclusive, mesmo que não seja potência de 2)."""
+    buckets = []
+    size = 1
+    while size < max_batch:
+        buckets.append(size)
+        size *= 2
+    return (*buckets, max(1, max_batch))
+
+
+def tflite_interpreter_class():
+    """LiteRT/tflite_runtime (leves, sem o TF completo) se instalados; senão tf.lite."""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def convert_tflite(model, precision: str, batch_size: int) -> bytes:
+    """
+    Quantização pós-treino: int8 = faixa dinâmica (pesos int8, ativações
+    float), float16 = pesos em meia precisão, float32 = sem quantização.
+    """
+    import tensorflow as tf
+
+    if precision not in TFLITE_PRECISIONS:
+        raise ValueError(f"Precisão inválida: {precision}. Opções: {TFLITE_PRECISIONS}")
+    fn = tf.function(
+        lambda x: model(x, training=False),
+        input_signature=[tf.TensorSpec([batch_size, WINDOW_SIZE, 1], tf.float32)],
+    )
+    # Sem o modelo como trackable, as variáveis são congeladas em constantes
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([fn.get_concrete_function()])
+    if precision != "float32":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if precision == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+
+def export_tflite(model, scaler_x, scaler_y, out_dir: str, precision: str = "int8", buckets=None) -> dict:
+    """Gera o diretório do SERVING_MODE=tflite (troca atômica, como o export .npz)."""
+    import shutil
+
+    buckets = tuple(sorted(buckets or tflite_buckets()))
+    staging_dir = f"{out_dir.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    files = {}
+    for bucket in buckets:
+        name = f"batch_{bucket}.tflite"
+        with open(os.path.join(staging_dir, name), "wb") as f:
+            f.write(convert_tflite(model, precision, bucket))
+        files[str(bucket)] = name
+
+    scalers = {}
+    for key, scaler in (("X", MinMaxParams.from_sklearn(scaler_x)), ("Y", MinMaxParams.from_sklearn(scaler_y))):
+        scalers[key] = {
+            "min": scaler.min_.tolist(),
+            "scale": scaler.scale_.tolist(),
+            "feature_range": scaler.feature_range,
+            "clip": scaler.clip,
+        }
+    manifest = {"precision": precision, "window_size": WINDOW_SIZE, "files": files, "scalers": scalers}
+    with open(os.path.join(staging_dir, TFLITE_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(staging_dir, out_dir)
+    return manifest
+
+
+def load_tflite(artifact_dir: str, threads: int = 1) -> tuple[TFLiteBackend, MinMaxParams, MinMaxParams, list[str]]:
+    """Backend + scalers do diretório exportado, sem TF/sklearn (com ai_edge_litert)."""
+    manifest_path = os.path.join(artifact_dir, TFLITE_MANIFEST)
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("window_size") != WINDOW_SIZE:
+        raise ValueError(f"Artefato TFLite com janela {manifest.get('window_size')} != {WINDOW_SIZE}.")
+
+    models = {}
+    paths = [manifest_path]
+    for bucket, name in manifest["files"].items():
+        path = os.path.join(artifact_dir, name)
+        with open(path, "rb") as f:
+            models[int(bucket)] = f.read()
+        paths.append(path)
+    scaler_x, scaler_y = (
+        MinMaxParams(s["min"], s["scale"], s["feature_range"], s["clip"])
+        for s in (manifest["scalers"]["X"], manifest["scalers"]["Y"])
+    )
+    return TFLiteBackend(models, manifest["precision"], threads), scaler_x, scaler_y, paths
+
+
+def measure_latency(backend, batch_size: int, repeats: int = 200) -> float:
+    """Mediana (ms) de `repeats` forwards de um lote `batch_size`, já aquecido."""
+    x = np.random.default_rng(0).random((batch_size, WINDOW_SIZE, 1), dtype=np.float32)
+    backend.predict(x)
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        backend.predict(x)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings) * 1000)
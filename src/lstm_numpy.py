@@ -0,0 +1,282 @@
+import json
+import os
+
+import numpy as np
+
+# --- Runtime NumPy da LSTM empilhada ---
+# Reproduz o forward de inferência do Sequential treinado no notebook
+# (LSTM -> Dropout -> LSTM -> Dropout -> Dense -> Dropout -> Dense) usando só
+# NumPy. Este módulo NÃO importa TensorFlow.
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _hard_sigmoid(x):
+    # Definição do Keras 3: relu6(x + 3) / 6
+    return np.clip(x / 6.0 + 0.5, 0.0, 1.0)
+
+
+ACTIVATIONS = {
+    "tanh": np.tanh,
+    "sigmoid": _sigmoid,
+    "hard_sigmoid": _hard_sigmoid,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "linear": lambda x: x,
+    None: lambda x: x,
+}
+
+
+def _activation(name):
+    if name not in ACTIVATIONS:
+        raise NotImplementedError(f"Ativação '{name}' não suportada pelo runtime NumPy.")
+    return ACTIVATIONS[name]
+
+
+class NumpyLSTM:
+    """
+    Forward puro em NumPy a partir da lista de camadas:
+    - {"type": "lstm", "kernel", "recurrent_kernel", "bias", "return_sequences",
+       "activation", "recurrent_activation"}
+    - {"type": "dense", "kernel", "bias", "activation"}
+    - {"type": "dropout", "rate"} (identidade na inferência; ativo no MC dropout)
+    """
+
+    def __init__(self, layers: list[dict], dtype=np.float32):
+        self.dtype = dtype
+        self.layers = []
+        for layer in layers:
+            layer = dict(layer)
+            for key in ("kernel", "recurrent_kernel", "bias"):
+                if key in layer:
+                    layer[key] = np.asarray(layer[key], dtype=dtype)
+            self.layers.append(layer)
+
+    @classmethod
+    def from_keras(cls, model) -> "NumpyLSTM":
+        """Extrai pesos e configuração das camadas de um modelo Keras já carregado."""
+        layers = []
+        for layer in model.layers:
+            kind = layer.__class__.__name__
+            config = layer.get_config()
+            weights = layer.get_weights()
+            if kind == "LSTM":
+                if config.get("go_backwards") or config.get("stateful") or not config.get("use_bias", True):
+                    raise NotImplementedError("Configuração de LSTM não suportada pelo runtime NumPy.")
+                kernel, recurrent_kernel, bias = weights
+                layers.append({
+                    "type": "lstm",
+                    "kernel": kernel,
+                    "recurrent_kernel": recurrent_kernel,
+                    "bias": bias,
+                    "return_sequences": bool(config.get("return_sequences", False)),
+                    "activation": config.get("activation", "tanh"),
+                    "recurrent_activation": config.get("recurrent_activation", "sigmoid"),
+                })
+            elif kind == "Dense":
+                kernel = weights[0]
+                bias = weights[1] if len(weights) > 1 else np.zeros(kernel.shape[1])
+                layers.append({
+                    "type": "dense",
+                    "kernel": kernel,
+                    "bias": bias,
+                    "activation": config.get("activation", "linear"),
+                })
+            elif kind == "Dropout":
+                layers.append({"type": "dropout", "rate": float(config.get("rate", 0.0))})
+            elif kind == "InputLayer":
+                continue
+            else:
+                raise NotImplementedError(f"Camada '{kind}' não suportada pelo runtime NumPy.")
+        return cls(layers)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            layer[key].nbytes
+            for layer in self.layers
+            for key in ("kernel", "recurrent_kernel", "bias")
+            if key in layer
+        )
+
+    def _lstm(self, x, layer):
+        kernel = layer["kernel"]
+        recurrent_kernel = layer["recurrent_kernel"]
+        act = _activation(layer["activation"])
+        rec_act = _activation(layer["recurrent_activation"])
+        n_samples, n_steps, _ = x.shape
+        units = recurrent_kernel.shape[0]
+
+        # Projeção da entrada para todos os timesteps em um único GEMM
+        x_proj = x @ kernel + layer["bias"]  # (N, T, 4u)
+
+        h = np.zeros((n_samples, units), dtype=self.dtype)
+        c = np.zeros((n_samples, units), dtype=self.dtype)
+        outputs = np.empty((n_samples, n_steps, units), dtype=self.dtype) if layer["return_sequences"] else None
+        for t in range(n_steps):
+            z = x_proj[:, t, :] + h @ recurrent_kernel
+            # Ordem dos gates no Keras: input, forget, cell, output
+            i = rec_act(z[:, :units])
+            f = rec_act(z[:, units:2 * units])
+            g = act(z[:, 2 * units:3 * units])
+            o = rec_act(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * act(c)
+            if outputs is not None:
+                outputs[:, t, :] = h
+        return outputs if outputs is not None else h
+
+    def predict(self, x: np.ndarray, rng: np.random.Generator | None = None) -> np.ndarray:
+        """
+        (N, T, F) -> (N, saídas). Sem `rng`, dropout desativado (modo inferência);
+        com `rng`, cada linha do lote recebe máscaras próprias (MC dropout), com o
+        mesmo escalonamento 1 / (1 - rate) do Keras em treino.
+        """
+        out = np.asarray(x, dtype=self.dtype)
+        for layer in self.layers:
+            if layer["type"] == "lstm":
+                out = self._lstm(out, layer)
+            elif layer["type"] == "dense":
+                out = _activation(layer["activation"])(out @ layer["kernel"] + layer["bias"])
+            elif layer["type"] == "dropout" and rng is not None and layer["rate"] > 0:
+                keep = 1.0 - layer["rate"]
+                mask = rng.random(out.shape, dtype=self.dtype) < keep
+                out = out * mask / self.dtype(keep)
+        return out
+
+
+class MinMaxParams:
+    """Equivalente NumPy do `MinMaxScaler` do sklearn (só transform/inverse_transform)."""
+
+    def __init__(self, min_, scale_, feature_range=(0.0, 1.0), clip=False):
+        self.min_ = np.asarray(min_, dtype=np.float64)
+        self.scale_ = np.asarray(scale_, dtype=np.float64)
+        self.feature_range = tuple(float(v) for v in feature_range)
+        self.clip = bool(clip)
+
+    @classmethod
+    def from_sklearn(cls, scaler) -> "MinMaxParams":
+        return cls(
+            scaler.min_,
+            scaler.scale_,
+            getattr(scaler, "feature_range", (0.0, 1.0)),
+            getattr(scaler, "clip", False),
+        )
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64) * self.scale_ + self.min_
+        if self.clip:
+            np.clip(X, self.feature_range[0], self.feature_range[1], out=X)
+        return X
+
+    def inverse_transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.min_) / self.scale_
+
+
+# --- Artefatos serializados ---
+# Os dois formatos (.npz compacto e arquivo mapeado em memória) compartilham o
+# mesmo layout: "meta" (JSON com camadas e scalers) +
+# "layer{i}_{kernel|recurrent_kernel|bias}" + "scaler_{X|Y}_{min|scale}".
+
+NPZ_FORMAT_VERSION = 1
+MMAP_ALIGNMENT = 64  # Alinhamento (bytes) de cada array no arquivo mapeado
+
+
+def _flatten(runtime: NumpyLSTM, scaler_x: MinMaxParams, scaler_y: MinMaxParams):
+    arrays = {}
+    layers_meta = []
+    for i, layer in enumerate(runtime.layers):
+        meta = {k: v for k, v in layer.items() if not isinstance(v, np.ndarray)}
+        for key in ("kernel", "recurrent_kernel", "bias"):
+            if key in layer:
+                arrays[f"layer{i}_{key}"] = layer[key]
+        layers_meta.append(meta)
+
+    scalers_meta = {}
+    for name, scaler in (("X", scaler_x), ("Y", scaler_y)):
+        arrays[f"scaler_{name}_min"] = scaler.min_
+        arrays[f"scaler_{name}_scale"] = scaler.scale_
+        scalers_meta[name] = {"feature_range": scaler.feature_range, "clip": scaler.clip}
+
+    meta = {"format_version": NPZ_FORMAT_VERSION, "layers": layers_meta, "scalers": scalers_meta}
+    return meta, arrays
+
+
+def _unflatten(meta: dict, arrays) -> tuple[NumpyLSTM, MinMaxParams, MinMaxParams]:
+    if meta.get("format_version") != NPZ_FORMAT_VERSION:
+        raise ValueError(f"Versão de artefato não suportada: {meta.get('format_version')}")
+
+    layers = []
+    for i, layer_meta in enumerate(meta["layers"]):
+        layer = dict(layer_meta)
+        for key in ("kernel", "recurrent_kernel", "bias"):
+            name = f"layer{i}_{key}"
+            if name in arrays:
+                layer[key] = arrays[name]
+        layers.append(layer)
+
+    scalers = {
+        name: MinMaxParams(
+            arrays[f"scaler_{name}_min"],
+            arrays[f"scaler_{name}_scale"],
+            **meta["scalers"][name],
+        )
+        for name in ("X", "Y")
+    }
+    return NumpyLSTM(layers), scalers["X"], scalers["Y"]
+
+
+def save_npz(path: str, runtime: NumpyLSTM, scaler_x: MinMaxParams, scaler_y: MinMaxParams):
+    meta, arrays = _flatten(runtime, scaler_x, scaler_y)
+    np.savez_compressed(path, meta=np.array(json.dumps(meta)), **arrays)
+
+
+def load_npz(path: str) -> tuple[NumpyLSTM, MinMaxParams, MinMaxParams]:
+    """Carrega o artefato .npz sem TensorFlow, joblib ou sklearn."""
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        arrays = {name: data[name] for name in data.files if name != "meta"}
+    return _unflatten(meta, arrays)
+
+
+def save_mmap(path: str, runtime: NumpyLSTM, scaler_x: MinMaxParams, scaler_y: MinMaxParams):
+    """
+    Grava os pesos em um único arquivo binário (arrays alinhados, sem compressão)
+    + um manifesto `<path>.json` com offsets, shapes e dtypes.
+    """
+    meta, arrays = _flatten(runtime, scaler_x, scaler_y)
+    index = {}
+    offset = 0
+    with open(path + ".tmp", "wb") as f:
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            padding = -offset % MMAP_ALIGNMENT
+            f.write(b"\0" * padding)
+            offset += padding
+            f.write(array.tobytes())
+            index[name] = {"offset": offset, "shape": list(array.shape), "dtype": array.dtype.str}
+            offset += array.nbytes
+    with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "arrays": index}, f)
+    # Troca atômica: workers nunca enxergam um arquivo pela metade
+    os.replace(path + ".tmp", path)
+    os.replace(path + ".json.tmp", path + ".json")
+
+
+def load_mmap(path: str) -> tuple[NumpyLSTM, MinMaxParams, MinMaxParams]:
+    """
+    Anexa ao arquivo de pesos via `np.memmap` somente leitura: as páginas vêm do
+    page cache do SO e são compartilhadas entre todos os processos que o mapeiam.
+    """
+    with open(path + ".json", "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    arrays = {}
+    for name, spec in manifest["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        arrays[name] = np.frombuffer(
+            buffer, dtype=dtype, count=count, offset=spec["offset"]
+        ).reshape(spec["shape"])
+    return _unflatten(manifest["meta"], arrays)
@@ -0,0 +1,231 @@
+import asyncio
+import heapq
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable
+from zoneinfo import ZoneInfo
+
+import httpx
+
+logger = logging.getLogger("API_Petrobras")
+
+# Pregão da B3: o "dia de negociação" usado no cache segue o fuso de São Paulo
+B3_TZ = ZoneInfo("America/Sao_Paulo")
+
+
+def trading_day() -> str:
+    return datetime.now(B3_TZ).strftime("%Y-%m-%d")
+
+
+@dataclass
+class CacheEntry:
+    values: list[float]
+    trading_day: str
+    fetched_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+
+class CircuitBreaker:
+    """Abre após `max_failures` falhas seguidas e fica aberto por `cooldown` segundos."""
+
+    def __init__(self, max_failures: int = 3, cooldown: float = 60.0):
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+
+    @property
+    def is_open(self) -> bool:
+        if self.opened_at is None:
+            return False
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            # Half-open: deixa a próxima tentativa passar
+            self.opened_at = None
+            self.failures = self.max_failures - 1
+            return False
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.max_failures:
+            self.opened_at = time.monotonic()
+
+
+class MarketDataClient:
+    """
+    Fonte dos últimos fechamentos diários (Alpha Vantage) para o /sample-data.
+
+    - Cliente HTTP assíncrono com pool de conexões keep-alive.
+    - Cache TTL por símbolo, válido apenas dentro do mesmo pregão; entradas
+      vencidas são servidas (stale-while-revalidate) enquanto uma atualização
+      roda em background.
+    - Single-flight: requisições concorrentes do mesmo símbolo compartilham
+      uma única chamada à API.
+    - Circuit breaker: após falhas seguidas, para de chamar a API por um tempo
+      e devolve o cache vencido, o histórico local (`history`, lido do data
+      store) ou, por último, o `fallback` fixo.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        fallback: list[float],
+        base_url: str = "https://www.alphavantage.co/query",
+        ttl: float = 900.0,
+        stale_ttl: float = 86400.0,
+        timeout: float = 15.0,
+        breaker: CircuitBreaker | None = None,
+        n_days: int = 60,
+        transport: httpx.AsyncBaseTransport | None = None,
+        history: Callable[[str, int], list[float] | None] | None = None,
+    ):
+        self.api_key = api_key
+        self.fallback = fallback
+        self.history = history
+        self.base_url = base_url
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.n_days = n_days
+        self.breaker = breaker or CircuitBreaker()
+        self._cache: dict[str, CacheEntry] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            transport=transport,
+        )
+
+    async def aclose(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        await self._client.aclose()
+
+    async def _local_history(self, symbol: str) -> list[float] | None:
+        if self.history is None:
+            return None
+        try:
+            # Leitura de disco (Parquet) fora do event loop
+            return await asyncio.to_thread(self.history, symbol, self.n_days)
+        except Exception as e:
+            logger.warning(f"⚠️ Histórico local indisponível para {symbol}: {e}")
+            return None
+
+    async def _fallback_response(self, symbol: str, reason: str) -> dict:
+        values = await self._local_history(symbol)
+        if values is not None:
+            logger.warning(f"⚠️ Falha no Alpha Vantage ({reason}). Usando o histórico local.")
+            return {
+                "source": "local_store",
+                "note": "Alpha Vantage indisponível no momento. Usando o histórico salvo localmente.",
+                "last_60_days": values,
+            }
+        logger.warning(f"⚠️ Falha no Alpha Vantage ({reason}). Usando fallback.")
+        return {
+            "source": "fallback_cached_data",
+            "note": "Alpha Vantage indisponível no momento. Usando dados recentes em cache.",
+            "last_60_days": self.fallback,
+        }
+
+    @staticmethod
+    def _response(entry: CacheEntry, cache_status: str) -> dict:
+        return {
+            "source": "alpha_vantage",
+            "cache": cache_status,
+            "last_60_days": entry.values,
+        }
+
+    async def get_last_closes(self, symbol: str) -> dict:
+        if not self.api_key:
+            values = await self._local_history(symbol)
+            return {
+                "source": "alpha_vantage" if values is None else "local_store",
+                "error": "ALPHAVANTAGE_API_KEY não configurada.",
+                "last_60_days": self.fallback if values is None else values,
+            }
+
+        entry = self._cache.get(symbol)
+        today = trading_day()
+        if entry is not None and entry.trading_day == today and entry.age < self.ttl:
+            return self._response(entry, "hit")
+
+        if entry is not None and entry.age < self.stale_ttl:
+            # Stale-while-revalidate: responde já e atualiza em background
+            if not self.breaker.is_open:
+                self._refresh(symbol)
+            return self._response(entry, "stale")
+
+        if self.breaker.is_open:
+            return await self._fallback_response(symbol, "circuit breaker aberto")
+
+        try:
+            # shield: se este chamador cancelar, a busca compartilhada continua
+            entry = await asyncio.shield(self._refresh(symbol))
+        except Exception as e:
+            return await self._fallback_response(symbol, str(e))
+        return self._response(entry, "miss")
+
+    def _refresh(self, symbol: str) -> asyncio.Task:
+        """Dispara (ou reaproveita) a única atualização em andamento do símbolo."""
+        task = self._inflight.get(symbol)
+        if task is None:
+            task = asyncio.create_task(self._fetch(symbol))
+            self._inflight[symbol] = task
+            task.add_done_callback(lambda t: self._on_refresh_done(symbol, t))
+        return task
+
+    def _on_refresh_done(self, symbol: str, task: asyncio.Task):
+        self._inflight.pop(symbol, None)
+        # Evita "Task exception was never retrieved" nas atualizações em background
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch(self, symbol: str) -> CacheEntry:
+        logger.info(f"Buscando dados no Alpha Vantage ({symbol})...")
+        try:
+            response = await self._client.get(
+                self.base_url,
+                params={"function": "TIME_SERIES_DAILY", "symbol": symbol, "apikey": self.api_key},
+            )
+            response.raise_for_status()
+            values = self.parse_closes(response.json(), self.n_days)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        entry = CacheEntry(values=values, trading_day=trading_day())
+        self._cache[symbol] = entry
+        return entry
+
+    @staticmethod
+    def parse_closes(payload: dict, n_days: int = 60) -> list[float]:
+        series = payload.get("Time Series (Daily)")
+        if not series:
+            message = (
+                payload.get("Note")
+                or payload.get("Information")
+                or payload.get("Error Message")
+                or "Resposta inesperada."
+            )
+            raise ValueError(message)
+
+        # Datas ISO ordenam como texto: pega só as n mais recentes (sem ordenar tudo)
+        last_dates = sorted(heapq.nlargest(n_days, series))
+        if len(last_dates) < n_days:
+            raise ValueError(f"Dados insuficientes: {len(last_dates)}")
+
+        values = []
+        for date in last_dates:
+            close = series[date].get("4. close")
+            if close is None:
+                raise ValueError(f"Campo de preço ausente em {date}.")
+            values.append(round(float(close), 2))
+        return values
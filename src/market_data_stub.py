@@ -0,0 +1,84 @@
+import argparse
+import json
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+# --- Servidor stub do Alpha Vantage ---
+# Responde TIME_SERIES_DAILY com uma série sintética determinística, para testar
+# o MarketDataClient e rodar benchmarks sem rede nem consumir a chave da API.
+# Uso: python -m src.market_data_stub --port 9000
+#      ALPHAVANTAGE_BASE_URL=http://localhost:9000/query uvicorn src.app:app
+
+
+def synthetic_payload(symbol: str, n_days: int = 100, seed: int = 42) -> dict:
+    rng = np.random.default_rng(seed)
+    closes = 30.0 + np.cumsum(rng.normal(0, 0.3, n_days))
+    start = date(2024, 1, 1)
+    series = {
+        (start + timedelta(days=i)).isoformat(): {"4. close": f"{close:.4f}"}
+        for i, close in enumerate(closes)
+    }
+    return {"Meta Data": {"2. Symbol": symbol}, "Time Series (Daily)": series}
+
+
+class StubState:
+    def __init__(self, latency: float = 0.0, fail: bool = False, n_days: int = 100):
+        self.latency = latency
+        self.fail = fail
+        self.n_days = n_days
+        self.hits = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with state.lock:
+                state.hits += 1
+            if state.latency:
+                time.sleep(state.latency)
+            query = parse_qs(urlparse(self.path).query)
+            symbol = query.get("symbol", ["PETR4.SA"])[0]
+            if state.fail:
+                self.send_response(503)
+                self.end_headers()
+                return
+            body = json.dumps(synthetic_payload(symbol, state.n_days)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, state: StubState | None = None):
+    """Sobe o stub em uma thread e retorna (server, state). Porta 0 = porta livre."""
+    state = state or StubState()
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub local do Alpha Vantage (TIME_SERIES_DAILY).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Atraso artificial (s).")
+    parser.add_argument("--fail", action="store_true", help="Responde sempre 503.")
+    args = parser.parse_args()
+    server, _ = start_stub_server(args.host, args.port, StubState(args.latency, args.fail))
+    print(f"Stub Alpha Vantage em http://{args.host}:{server.server_port}/query")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
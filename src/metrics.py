@@ -0,0 +1,123 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# --- Métricas customizadas de inferência ---
+# Registradas no REGISTRY padrão do prometheus_client, então aparecem no mesmo
+# /metrics exposto pelo Instrumentator.
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.0075, 0.01, 0.025, 0.05, 0.075,
+    0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0,
+)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+# Etapas individuais ficam na faixa de dezenas de µs a poucos ms
+STAGE_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+# decode: parse/validação do corpo | cache: hash + consulta ao cache de janelas
+# scale: scaler_X.transform | forward: model.predict | inverse: scaler_Y.inverse_transform
+# encode: serialização da resposta binária. scale/forward/inverse são por lote.
+INFERENCE_STAGES = ("decode", "cache", "scale", "forward", "inverse", "encode")
+
+INFERENCE_REQUEST_LATENCY = Histogram(
+    "inference_request_latency_seconds",
+    "Latência de cada janela dentro do micro-batcher (enfileiramento + forward).",
+    buckets=LATENCY_BUCKETS,
+)
+INFERENCE_WINDOWS = Counter(
+    "inference_windows_total",
+    "Janelas de 60 dias processadas pelo micro-batcher.",
+)
+INFERENCE_BATCHES = Counter(
+    "inference_batches_total",
+    "Forwards em lote executados pelo micro-batcher.",
+)
+INFERENCE_BATCH_SIZE = Histogram(
+    "inference_batch_size",
+    "Quantidade de janelas agrupadas em cada forward do micro-batcher.",
+    ["ticker", "model_version"],
+    buckets=BATCH_SIZE_BUCKETS,
+)
+INFERENCE_MC_SAMPLES = Histogram(
+    "inference_mc_samples",
+    "Amostras de MC dropout por requisição do /predict?samples=k (após o limite de latência).",
+    ["ticker", "model_version"],
+    buckets=BATCH_SIZE_BUCKETS,
+)
+INFERENCE_QUEUE_WAIT = Histogram(
+    "inference_queue_wait_seconds",
+    "Tempo de cada janela na fila do micro-batcher até o início do forward.",
+    ["ticker", "model_version"],
+    buckets=STAGE_BUCKETS,
+)
+INFERENCE_STAGE_SECONDS = Histogram(
+    "inference_stage_seconds",
+    "Duração de cada etapa da inferência (decode, cache, scale, forward, inverse, encode).",
+    ["stage", "ticker", "model_version"],
+    buckets=STAGE_BUCKETS,
+)
+INFERENCE_QUEUE_DEPTH = Gauge(
+    "inference_queue_depth",
+    "Janelas aguardando na fila do micro-batcher.",
+)
+
+PREDICTION_CACHE_HITS = Counter(
+    "prediction_cache_hits_total",
+    "Previsões do /predict servidas pelo cache de janelas.",
+)
+PREDICTION_CACHE_MISSES = Counter(
+    "prediction_cache_misses_total",
+    "Consultas ao cache de janelas que exigiram inferência.",
+)
+PREDICTION_CACHE_EVICTIONS = Counter(
+    "prediction_cache_evictions_total",
+    "Entradas removidas do cache de janelas.",
+    ["reason"],
+)
+PREDICTION_CACHE_SIZE = Gauge(
+    "prediction_cache_entries",
+    "Entradas atualmente no cache de janelas.",
+)
+
+STREAM_SESSIONS = Gauge(
+    "stream_sessions",
+    "Sessões de streaming ativas (janelas em ring buffer).",
+)
+STREAM_SESSION_EVICTIONS = Counter(
+    "stream_session_evictions_total",
+    "Sessões de streaming removidas (ociosidade ou teto de memória).",
+    ["reason"],
+)
+
+MODEL_LOAD_SECONDS = Histogram(
+    "model_load_seconds",
+    "Tempo de carga dos artefatos de um modelo, por ticker.",
+    ["ticker"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+MODEL_RESIDENT = Gauge(
+    "model_resident",
+    "1 se o modelo do ticker está carregado em memória.",
+    ["ticker"],
+)
+MODEL_REGISTRY_BYTES = Gauge(
+    "model_registry_resident_bytes",
+    "Estimativa de bytes de pesos dos modelos residentes.",
+)
+MODEL_REGISTRY_EVICTIONS = Counter(
+    "model_registry_evictions_total",
+    "Modelos removidos da memória pelo LRU do registry.",
+)
+MODEL_RELOADS = Counter(
+    "model_reloads_total",
+    "Trocas de versão de modelo (hot-swap), por ticker e resultado.",
+    ["ticker", "result"],
+)
+
+
+def stage_observers(ticker: str, model_version: str) -> dict:
+    """`observe` de cada etapa com os labels já resolvidos (evita o .labels() por chamada)."""
+    return {
+        stage: INFERENCE_STAGE_SECONDS.labels(stage, ticker, model_version).observe
+        for stage in INFERENCE_STAGES
+    }
@@ -0,0 +1,484 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import cached_property
+
+import numpy as np
+
+from src.config import (
+    INFERENCE_BACKEND,
+    MC_LATENCY_BUDGET_MS,
+    MC_SAMPLES_MAX,
+    PREDICT_CHUNK_SIZE,
+    SERVING_MODE,
+    TFLITE_PRECISION,
+    TFLITE_THREADS,
+    WINDOW_SIZE,
+)
+from src.inference import NumpyBackend, create_backend, load_tflite, tflite_dir, warmup
+from src.lstm_numpy import load_mmap, load_npz
+from src.metrics import (
+    INFERENCE_MC_SAMPLES,
+    MODEL_LOAD_SECONDS,
+    MODEL_REGISTRY_BYTES,
+    MODEL_REGISTRY_EVICTIONS,
+    MODEL_RELOADS,
+    MODEL_RESIDENT,
+    stage_observers,
+)
+from src.uncertainty import SampleBudget
+
+logger = logging.getLogger("API_Petrobras")
+
+# Tickers da B3/Yahoo (PETR4.SA, VALE3.SA, ^BVSP...). Também impede path traversal.
+TICKER_PATTERN = re.compile(r"^[A-Z0-9^][A-Z0-9.\-^]{0,19}$")
+
+# Versões publicadas: <dir do modelo>/versions/<release>/ + arquivo ACTIVE com o
+# nome da release em uso. Sem ACTIVE, os artefatos ficam direto no diretório.
+VERSIONS_DIR = "versions"
+ACTIVE_FILE = "ACTIVE"
+RELEASE_PATTERN = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.\-]{0,63}$")
+
+
+# --- Carregamento de artefatos ---
+
+def load_keras_model(model_path: str):
+    import tensorflow as tf
+
+    if os.path.isdir(model_path):
+        config_path = os.path.join(model_path, "config.json")
+        weights_path = os.path.join(model_path, "model.weights.h5")
+        if not os.path.exists(config_path) or not os.path.exists(weights_path):
+            raise FileNotFoundError(
+                f"Arquivos do modelo não encontrados em {model_path}."
+            )
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        try:
+            deserializer = tf.keras.saving.deserialize_keras_object
+        except AttributeError:
+            from keras.saving import deserialize_keras_object as deserializer
+        model = deserializer(config)
+        model.load_weights(weights_path)
+        return model
+    return tf.keras.models.load_model(model_path)
+
+
+def load_lstm_model(model_path: str, backend: str = INFERENCE_BACKEND, warm: bool = True):
+    """
+    Carrega o modelo Keras e escolhe o backend de inferência usado no serving
+    (keras, tf_function ou numpy), já aquecido (a menos que `warm=False`).
+    """
+    model = load_keras_model(model_path)
+    inference_backend = create_backend(model, backend, warm=warm)
+    logger.info(f"⚙️ Backend de inferência: {inference_backend.name}")
+    return inference_backend
+
+
+def load_scaler(scaler_path: str):
+    import joblib
+    from sklearn.exceptions import InconsistentVersionWarning
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=InconsistentVersionWarning)
+        return joblib.load(scaler_path)
+
+
+def artifact_version(*paths: str) -> str:
+    """Versão do modelo = hash curto do conteúdo dos artefatos carregados."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def load_artifacts(models_dir: str, serving_mode: str = SERVING_MODE, mmap_path: str = "", warm: bool = True):
+    """
+    Retorna (backend, scaler_X, scaler_Y, versão) a partir de `models_dir`.
+    - tensorflow: lstm_model.keras + scaler_X.pkl/scaler_Y.pkl (TF, joblib, sklearn)
+    - numpy: lstm_model.npz (só NumPy; gerado por `python exportar_modelo.py`), ou
+      o arquivo de pesos mapeado em memória `mmap_path` (workers do src.serve)
+    - tflite: tflite_<TFLITE_PRECISION>/ (modelo quantizado; `exportar_modelo.py --tflite`)
+    """
+    if serving_mode == "tflite":
+        artifact_dir = tflite_dir(models_dir, TFLITE_PRECISION)
+        if not os.path.isdir(artifact_dir):
+            raise FileNotFoundError(
+                f"Artefato {artifact_dir} não encontrado. "
+                f"Rode `python exportar_modelo.py --tflite {TFLITE_PRECISION}`."
+            )
+        backend, scaler_x, scaler_y, paths = load_tflite(artifact_dir, TFLITE_THREADS)
+        if warm:
+            warmup(backend)
+        return backend, scaler_x, scaler_y, artifact_version(*paths)
+
+    if serving_mode == "numpy":
+        npz_path = os.path.join(models_dir, "lstm_model.npz")
+        if mmap_path and os.path.exists(mmap_path):
+            runtime, scaler_x, scaler_y = load_mmap(mmap_path)
+            version = artifact_version(mmap_path)
+            logger.info(f"🧩 Pesos anexados via mmap: {mmap_path}")
+        elif os.path.exists(npz_path):
+            runtime, scaler_x, scaler_y = load_npz(npz_path)
+            version = artifact_version(npz_path)
+        else:
+            raise FileNotFoundError(
+                f"Artefato {npz_path} não encontrado. Rode `python exportar_modelo.py`."
+            )
+        backend = NumpyBackend(runtime)
+        if warm:
+            warmup(backend)
+        return backend, scaler_x, scaler_y, version
+
+    if serving_mode != "tensorflow":
+        raise ValueError(f"SERVING_MODE inválido: {serving_mode}. Use 'tensorflow', 'numpy' ou 'tflite'.")
+
+    model_path = os.path.join(models_dir, "lstm_model.keras")
+    scaler_x_path = os.path.join(models_dir, "scaler_X.pkl")
+    scaler_y_path = os.path.join(models_dir, "scaler_Y.pkl")
+
+    # Verificar se arquivos existem
+    if (
+        not os.path.exists(model_path)
+        or not os.path.exists(scaler_x_path)
+        or not os.path.exists(scaler_y_path)
+    ):
+        raise FileNotFoundError(
+            f"Arquivos não encontrados em {models_dir}. Verifique a pasta 'src/models'."
+        )
+
+    return (
+        load_lstm_model(model_path, warm=warm),
+        load_scaler(scaler_x_path),
+        load_scaler(scaler_y_path),
+        artifact_version(model_path, scaler_x_path, scaler_y_path),
+    )
+
+
+# --- Modelo carregado (um por ticker) ---
+
+@dataclass(eq=False)
+class ModelBundle:
+    ticker: str
+    model: object
+    scaler_x: object
+    scaler_y: object
+    version: str
+    release: str | None = None
+    load_seconds: float = 0.0
+    warmup_seconds: float = 0.0
+    loaded_at: float = field(default_factory=time.time)
+
+    @property
+    def tag(self) -> str:
+        """Identificador ticker@versão (usado em cache e logs)."""
+        return f"{self.ticker}@{self.version}"
+
+    @property
+    def nbytes(self) -> int:
+        return int(getattr(self.model, "nbytes", 0))
+
+    @property
+    def labels(self) -> tuple[str, str]:
+        """Labels (ticker, model_version) das métricas de inferência."""
+        return self.ticker, self.version
+
+    @cached_property
+    def stages(self) -> dict:
+        """Histogramas por etapa (inference_stage_seconds) deste ticker@versão."""
+        return stage_observers(*self.labels)
+
+    def scale_series(self, values) -> np.ndarray:
+        """Aplica o scaler_X (treinado com 1 feature) em qualquer shape, de uma vez só."""
+        started = time.perf_counter()
+        values = np.asarray(values, dtype=np.float64)
+        scaled = self.scaler_x.transform(values.reshape(-1, 1)).reshape(values.shape)
+        self.stages["scale"](time.perf_counter() - started)
+        return scaled
+
+    def forecast_scaled(self, scaled_windows: np.ndarray) -> np.ndarray:
+        """(N, 60) janelas já normalizadas -> (N,) previsões em R$."""
+        n_windows = scaled_windows.shape[0]
+        started = time.perf_counter()
+        final_input = np.asarray(scaled_windows, dtype=np.float32).reshape(n_windows, WINDOW_SIZE, 1)
+        prediction_scaled = self.model.predict(final_input)
+        forward_done = time.perf_counter()
+        prediction_real = self.scaler_y.inverse_transform(
+            np.asarray(prediction_scaled).reshape(-1, 1)
+        )
+        self.stages["forward"](forward_done - started)
+        self.stages["inverse"](time.perf_counter() - forward_done)
+        return prediction_real.ravel()
+
+    @cached_property
+    def sample_budget(self) -> SampleBudget:
+        """Custo estimado do forward com dropout ativo (limita o k do MC dropout)."""
+        return SampleBudget(MC_LATENCY_BUDGET_MS / 1000, MC_SAMPLES_MAX)
+
+    def sample_window(self, window, samples: int, rng: np.random.Generator | None = None) -> np.ndarray:
+        """
+        MC dropout: (60,) preços em R$ -> (k,) previsões em R$ com o dropout
+        ativo, todas em um único forward (k, 60, 1). k é o `samples` pedido,
+        limitado pelo orçamento de latência (`sample_budget`).
+        """
+        scaled = np.asarray(self.scale_series(window), dtype=np.float32).reshape(1, WINDOW_SIZE, 1)
+        budget = self.sample_budget
+        if not budget.calibrated:
+            def forward(k: int) -> float:
+                started = time.perf_counter()
+                self.model.sample(np.repeat(scaled, k, axis=0))
+                return time.perf_counter() - started
+
+            budget.calibrate(forward)
+
+        n_samples = budget.cap(samples)
+        started = time.perf_counter()
+        prediction_scaled = self.model.sample(np.repeat(scaled, n_samples, axis=0), rng)
+        forward_done = time.perf_counter()
+        budget.observe(n_samples, forward_done - started)
+        prediction_real = self.scaler_y.inverse_transform(np.asarray(prediction_scaled).reshape(-1, 1))
+        self.stages["forward"](forward_done - started)
+        self.stages["inverse"](time.perf_counter() - forward_done)
+        INFERENCE_MC_SAMPLES.labels(*self.labels).observe(n_samples)
+        return prediction_real.ravel()
+
+    def predict_windows(self, windows: np.ndarray) -> np.ndarray:
+        """
+        Pipeline vetorizado: (N, 60) preços em R$ -> (N,) previsões em R$.
+        Um único transform, um único forward e um único inverse_transform por lote.
+        """
+        return self.forecast_scaled(self.scale_series(windows))
+
+    def forecast_scaled_chunked(self, scaled_windows: np.ndarray, chunk_size: int = PREDICT_CHUNK_SIZE) -> np.ndarray:
+        """Inferência em blocos de `chunk_size` para limitar a memória de lotes grandes."""
+        n_windows = scaled_windows.shape[0]
+        predictions = np.empty(n_windows, dtype=np.float64)
+        for start in range(0, n_windows, chunk_size):
+            end = min(start + chunk_size, n_windows)
+            predictions[start:end] = self.forecast_scaled(scaled_windows[start:end])
+        return predictions
+
+
+class UnknownTickerError(LookupError):
+    pass
+
+
+class UnknownReleaseError(LookupError):
+    pass
+
+
+class ModelRegistry:
+    """
+    Modelos por ticker carregados sob demanda e compartilhados entre requisições.
+
+    Layout: `<models_dir>/<TICKER>/` com os mesmos artefatos do modelo padrão.
+    O ticker padrão também aceita os artefatos direto em `<models_dir>/`
+    (layout original do projeto). Quando a soma estimada dos pesos residentes
+    passa de `memory_budget_bytes`, os menos usados recentemente são removidos.
+
+    Troca de versão (`reload`): a nova versão é carregada e aquecida fora do
+    lock e só então substitui a referência; requisições em andamento terminam
+    com o bundle antigo, que é liberado quando a última delas solta a referência.
+    """
+
+    def __init__(
+        self,
+        models_dir: str,
+        default_ticker: str,
+        memory_budget_bytes: int,
+        serving_mode: str = SERVING_MODE,
+        mmap_path: str = "",
+        on_load=None,
+    ):
+        self.models_dir = models_dir
+        self.default_ticker = default_ticker
+        self.memory_budget_bytes = memory_budget_bytes
+        self.serving_mode = serving_mode
+        self.mmap_path = mmap_path
+        self.on_load = on_load
+        self._models: OrderedDict[str, ModelBundle] = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: dict[str, threading.Lock] = {}
+
+    def model_dir(self, ticker: str) -> str:
+        if not TICKER_PATTERN.match(ticker):
+            raise UnknownTickerError(f"Ticker inválido: {ticker}")
+        ticker_dir = os.path.join(self.models_dir, ticker)
+        if os.path.isdir(ticker_dir):
+            return ticker_dir
+        if ticker == self.default_ticker:
+            return self.models_dir
+        raise UnknownTickerError(f"Nenhum modelo disponível para {ticker}.")
+
+    def get_resident(self, ticker: str) -> ModelBundle | None:
+        """Modelo já carregado (sem I/O); marca como usado recentemente."""
+        with self._lock:
+            bundle = self._models.get(ticker)
+            if bundle is not None:
+                self._models.move_to_end(ticker)
+            return bundle
+
+    def get(self, ticker: str) -> ModelBundle:
+        """Retorna o modelo do ticker, carregando-o se necessário (bloqueante)."""
+        bundle = self.get_resident(ticker)
+        if bundle is not None:
+            return bundle
+
+        models_dir = self.model_dir(ticker)
+        # Single-flight: só uma thread carrega cada ticker; as demais esperam
+        with self._load_lock(ticker):
+            bundle = self.get_resident(ticker)
+            if bundle is not None:
+                return bundle
+            bundle = self._load(ticker, models_dir, self.active_release(models_dir))
+            self._install(bundle)
+            return bundle
+
+    def reload(self, ticker: str, release: str | None = None) -> ModelBundle:
+        """
+        Carrega e aquece `release` (ou a versão apontada por ACTIVE) e troca a
+        referência do ticker. Com `release`, também grava o ACTIVE, para que
+        reinícios e os outros workers (via watcher) passem a usá-la.
+        """
+        models_dir = self.model_dir(ticker)
+        with self._load_lock(ticker):
+            try:
+                bundle = self._load(
+                    ticker, models_dir, release if release is not None else self.active_release(models_dir)
+                )
+            except Exception:
+                MODEL_RELOADS.labels(ticker=ticker, result="error").inc()
+                raise
+            previous = self.get_resident(ticker)
+            self._install(bundle)
+            if release is not None:
+                self._write_active(models_dir, release)
+        MODEL_RELOADS.labels(ticker=ticker, result="success").inc()
+        logger.info(
+            f"🔁 {ticker}: {previous.tag if previous else '-'} -> {bundle.tag} "
+            f"(release {bundle.release or '-'})."
+        )
+        return bundle
+
+    def active_release(self, models_dir: str) -> str | None:
+        """Release apontada pelo arquivo ACTIVE do diretório (None = layout sem versões)."""
+        try:
+            with open(os.path.join(models_dir, ACTIVE_FILE), "r", encoding="utf-8") as f:
+                release = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return release or None
+
+    def artifacts_dir(self, models_dir: str, release: str | None) -> str:
+        if release is None:
+            return models_dir
+        path = os.path.join(models_dir, VERSIONS_DIR, release)
+        if not RELEASE_PATTERN.match(release) or not os.path.isdir(path):
+            raise UnknownReleaseError(f"Versão {release} não encontrada em {models_dir}.")
+        return path
+
+    def _write_active(self, models_dir: str, release: str):
+        # Escrita atômica: o watcher dos outros workers nunca lê um arquivo pela metade
+        path = os.path.join(models_dir, ACTIVE_FILE)
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(release + "\n")
+        os.replace(tmp_path, path)
+
+    def _load_lock(self, ticker: str) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(ticker, threading.Lock())
+
+    def _load(self, ticker: str, models_dir: str, release: str | None = None) -> ModelBundle:
+        artifacts_dir = self.artifacts_dir(models_dir, release)
+        logger.info(f"📥 Carregando modelo de {ticker} ({artifacts_dir})...")
+        started = time.perf_counter()
+        mmap_path = self.mmap_path if artifacts_dir == self.models_dir else ""
+        model, scaler_x, scaler_y, version = load_artifacts(
+            artifacts_dir, self.serving_mode, mmap_path, warm=False
+        )
+        loaded = time.perf_counter()
+        warmup(model)
+        warmed = time.perf_counter()
+        MODEL_LOAD_SECONDS.labels(ticker=ticker).observe(warmed - started)
+        logger.info(
+            f"✅ Modelo {ticker}@{version} carregado em {loaded - started:.2f}s "
+            f"(+{warmed - loaded:.2f}s de warm-up)."
+        )
+        return ModelBundle(
+            ticker, model, scaler_x, scaler_y, version,
+            release=release,
+            load_seconds=loaded - started,
+            warmup_seconds=warmed - loaded,
+        )
+
+    def _install(self, bundle: ModelBundle):
+        with self._lock:
+            self._models[bundle.ticker] = bundle
+            self._models.move_to_end(bundle.ticker)
+            MODEL_RESIDENT.labels(ticker=bundle.ticker).set(1)
+            self._evict_over_budget(keep=bundle.ticker)
+            MODEL_REGISTRY_BYTES.set(self.resident_bytes)
+        if self.on_load is not None:
+            self.on_load(bundle)
+
+    def _evict_over_budget(self, keep: str):
+        # Chamado com self._lock. Requisições em andamento mantêm a referência
+        # ao bundle removido e terminam normalmente.
+        while self.resident_bytes > self.memory_budget_bytes and len(self._models) > 1:
+            ticker, bundle = next(iter(self._models.items()))
+            if ticker == keep:
+                break
+            del self._models[ticker]
+            MODEL_RESIDENT.labels(ticker=ticker).set(0)
+            MODEL_REGISTRY_EVICTIONS.inc()
+            logger.info(f"♻️ Modelo {bundle.tag} removido da memória (LRU).")
+
+    async def watch(self, interval: float):
+        """
+        Recarrega os tickers residentes quando o ACTIVE do diretório aponta para
+        outra release (deploy trocou a versão, ou outro worker fez o hot-swap).
+        """
+        loop = asyncio.get_running_loop()
+        failed: dict[str, str | None] = {}
+        unreadable: set[str] = set()
+        while True:
+            await asyncio.sleep(interval)
+            for bundle in self.resident():
+                try:
+                    release = self.active_release(self.model_dir(bundle.ticker))
+                except Exception as e:
+                    # Diretório removido/renomeado no meio de um deploy: mantém o
+                    # bundle atual e segue vigiando os demais tickers (loga uma vez)
+                    if bundle.ticker not in unreadable:
+                        unreadable.add(bundle.ticker)
+                        logger.error(f"❌ Falha ao ler a release ativa de {bundle.ticker}: {e}")
+                    continue
+                unreadable.discard(bundle.ticker)
+                # Não insiste em uma release que já falhou até o ACTIVE mudar de novo
+                if release == bundle.release or failed.get(bundle.ticker, bundle.release) == release:
+                    continue
+                try:
+                    await loop.run_in_executor(None, self.reload, bundle.ticker)
+                    failed.pop(bundle.ticker, None)
+                except Exception as e:
+                    failed[bundle.ticker] = release
+                    logger.error(f"❌ Falha ao trocar {bundle.ticker} para a release {release}: {e}")
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(bundle.nbytes for bundle in self._models.values())
+
+    def resident(self) -> list[ModelBundle]:
+        with self._lock:
+            return list(self._models.values())
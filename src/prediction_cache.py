@@ -0,0 +1,78 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.metrics import (
+    PREDICTION_CACHE_EVICTIONS,
+    PREDICTION_CACHE_HITS,
+    PREDICTION_CACHE_MISSES,
+    PREDICTION_CACHE_SIZE,
+)
+
+
+def window_key(window: np.ndarray, model_version: str, decimals: int = 4) -> bytes:
+    """Hash da janela arredondada + versão do modelo (janelas iguais -> mesma chave)."""
+    rounded = np.round(np.asarray(window, dtype=np.float64), decimals) + 0.0  # normaliza -0.0
+    digest = hashlib.blake2b(rounded.astype("<f8").tobytes(), digest_size=16)
+    digest.update(model_version.encode())
+    return digest.digest()
+
+
+class PredictionCache:
+    """
+    LRU limitado a `max_entries`, com expiração por `ttl` segundos. Cada entrada
+    guarda o ticker@versão do modelo para `invalidate` descartar as previsões de
+    versões substituídas (nunca mais acertadas, mas ocupariam espaço até o TTL).
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict[bytes, tuple[float, float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> float | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                PREDICTION_CACHE_MISSES.inc()
+                return None
+            value, stored_at, _ = item
+            if time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                PREDICTION_CACHE_EVICTIONS.labels(reason="ttl").inc()
+                PREDICTION_CACHE_MISSES.inc()
+                PREDICTION_CACHE_SIZE.set(len(self._data))
+                return None
+            self._data.move_to_end(key)
+            PREDICTION_CACHE_HITS.inc()
+            return value
+
+    def put(self, key: bytes, value: float, tag: str = ""):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic(), tag)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                PREDICTION_CACHE_EVICTIONS.labels(reason="lru").inc()
+            PREDICTION_CACHE_SIZE.set(len(self._data))
+
+    def invalidate(self, ticker: str, keep: str | None = None) -> int:
+        """Remove as entradas de `ticker` cuja tag (ticker@versão) não é `keep`."""
+        prefix = f"{ticker}@"
+        with self._lock:
+            stale = [key for key, (_, _, tag) in self._data.items() if tag.startswith(prefix) and tag != keep]
+            for key in stale:
+                del self._data[key]
+            if stale:
+                PREDICTION_CACHE_EVICTIONS.labels(reason="invalidation").inc(len(stale))
+                PREDICTION_CACHE_SIZE.set(len(self._data))
+        return len(stale)
+
+    def __len__(self) -> int:
+        return len(self._data)
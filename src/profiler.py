@@ -0,0 +1,77 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# --- Profiler por amostragem (tráfego real) ---
+# Uma thread lê a pilha Python de todas as threads (sys._current_frames) a cada
+# `interval` segundos e conta as pilhas no formato "folded" do flamegraph
+# (raiz;...;folha N), aceito por flamegraph.pl, speedscope e inferno.
+# Não instrumenta nada: fora de uma captura o custo é zero.
+
+# Folhas de threads ociosas (event loop esperando I/O, threadpool sem trabalho)
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+class ProfilerBusy(RuntimeError):
+    """Já existe uma captura em andamento (uma por processo)."""
+
+
+_lock = threading.Lock()
+
+
+def _thread_label(name: str) -> str:
+    # "AnyIO worker thread" / "ThreadPoolExecutor-0_3" -> agrupa threads do mesmo pool
+    return re.sub(r"[-_]?\d+(_\d+)?$", "", name) or "thread"
+
+
+def _folded(frame, include_idle: bool) -> list[str] | None:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((os.path.basename(code.co_filename), code.co_name, frame.f_lineno))
+        frame = frame.f_back
+    if not stack or (not include_idle and stack[0][:2] in IDLE_LEAVES):
+        return None
+    return [f"{func} ({filename}:{line})" for filename, func, line in reversed(stack)]
+
+
+def sample(seconds: float, interval: float = 0.005, include_idle: bool = False) -> tuple[Counter, int]:
+    """
+    Amostra as pilhas por `seconds` segundos. Retorna (contagem por pilha
+    folded, nº de amostras). Bloqueia a thread chamadora (use em threadpool).
+    """
+    if not _lock.acquire(blocking=False):
+        raise ProfilerBusy("Já existe uma captura de profiling em andamento.")
+    try:
+        own = threading.get_ident()
+        names = {}
+        stacks: Counter = Counter()
+        n_samples = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            frames = sys._current_frames()
+            if len(names) != len(frames):
+                names = {t.ident: _thread_label(t.name) for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                folded = _folded(frame, include_idle)
+                if folded is not None:
+                    stacks[";".join([names.get(ident, "thread"), *folded])] += 1
+            n_samples += 1
+            time.sleep(interval)
+        return stacks, n_samples
+    finally:
+        _lock.release()
+
+
+def render_folded(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,157 @@
+import os
+
+# Cada worker usa 1 thread de BLAS: o paralelismo vem dos processos, não das
+# threads (evita oversubscription quando há um worker por core). Precisa ser
+# definido antes de qualquer import do NumPy.
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+import argparse
+import logging
+import multiprocessing as mp
+import signal
+import socket
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.config import API_PIN_CORES, API_WORKERS
+from src.lstm_numpy import load_npz, save_mmap
+
+# --- Serving multi-processo ---
+# O processo mestre prepara um arquivo de pesos mapeável (uma vez), abre o
+# socket e dispara N workers uvicorn. Cada worker roda no SERVING_MODE=numpy e
+# anexa ao mesmo arquivo via mmap somente leitura: as páginas dos pesos ficam
+# no page cache e são compartilhadas, em vez de cada worker desserializar sua
+# própria cópia do modelo.
+# Uso: python -m src.serve --workers 4 --port 8000
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("API_Petrobras")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+
+def prepare_weights(npz_path: str, mmap_path: str) -> str:
+    """Gera (ou reaproveita) o arquivo mapeável a partir do lstm_model.npz."""
+    if not os.path.exists(npz_path):
+        raise FileNotFoundError(
+            f"Artefato {npz_path} não encontrado. Rode `python exportar_modelo.py`."
+        )
+    up_to_date = (
+        os.path.exists(mmap_path)
+        and os.path.exists(mmap_path + ".json")
+        and os.path.getmtime(mmap_path) >= os.path.getmtime(npz_path)
+    )
+    if not up_to_date:
+        save_mmap(mmap_path, *load_npz(npz_path))
+        logger.info(f"🧩 Arquivo de pesos mapeável gerado em {mmap_path}")
+    return mmap_path
+
+
+def _run_worker(sock: socket.socket, cpu: int | None, host: str, port: int):
+    import uvicorn
+
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+    config = uvicorn.Config("src.app:app", host=host, port=port, log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def memory_report(pids: list[int]) -> dict:
+    """
+    Soma RSS e PSS dos workers (Linux). PSS divide as páginas compartilhadas
+    entre os processos que as mapeiam, então mede o custo real de cada worker.
+    """
+    totals = {"rss_mb": 0.0, "pss_mb": 0.0}
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup", "r", encoding="utf-8") as f:
+                for line in f:
+                    key, _, rest = line.partition(":")
+                    if key in ("Rss", "Pss"):
+                        totals[f"{key.lower()}_mb"] += int(rest.split()[0]) / 1024
+        except OSError:
+            continue
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serving multi-processo com pesos compartilhados via mmap.")
+    parser.add_argument("--workers", type=int, default=API_WORKERS)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--no-pin", action="store_true", help="Não fixa cada worker em um core.")
+    parser.add_argument("--npz", default=os.path.join(MODELS_DIR, "lstm_model.npz"))
+    parser.add_argument("--mmap", default=os.path.join(MODELS_DIR, "lstm_model.weights.bin"))
+    args = parser.parse_args()
+
+    mmap_path = prepare_weights(args.npz, args.mmap)
+    # Herdado pelos workers (spawn): todos anexam ao mesmo arquivo
+    os.environ["SERVING_MODE"] = "numpy"
+    os.environ["MODEL_WEIGHTS_MMAP"] = os.path.abspath(mmap_path)
+    # ...e o nº real de workers, que desliga o /stream/* quando passa de 1
+    os.environ["API_WORKERS"] = str(max(1, args.workers))
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.set_inheritable(True)
+
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    pin = API_PIN_CORES and not args.no_pin and bool(cpus)
+
+    ctx = mp.get_context("spawn")
+    workers = []
+    for i in range(max(1, args.workers)):
+        cpu = cpus[i % len(cpus)] if pin else None
+        process = ctx.Process(
+            target=_run_worker, args=(sock, cpu, args.host, args.port), name=f"api-worker-{i}"
+        )
+        process.start()
+        workers.append(process)
+        logger.info(f"👷 Worker {i} (pid {process.pid}) iniciado" + (f" no core {cpu}" if cpu is not None else ""))
+
+    stopping = False
+
+    def _shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    reported = False
+    started_at = time.monotonic()
+    while not stopping:
+        time.sleep(1)
+        for i, process in enumerate(workers):
+            if not process.is_alive() and not stopping:
+                logger.warning(f"⚠️ Worker {i} saiu (código {process.exitcode}). Reiniciando...")
+                cpu = cpus[i % len(cpus)] if pin else None
+                workers[i] = ctx.Process(
+                    target=_run_worker, args=(sock, cpu, args.host, args.port), name=f"api-worker-{i}"
+                )
+                workers[i].start()
+        if not reported and time.monotonic() - started_at > 10:
+            report = memory_report([p.pid for p in workers])
+            logger.info(
+                f"📊 Memória dos {len(workers)} workers: RSS {report['rss_mb']:.1f} MB | "
+                f"PSS {report['pss_mb']:.1f} MB"
+            )
+            reported = True
+
+    for process in workers:
+        process.join(timeout=10)
+    sock.close()
+    logger.info("🛑 Workers encerrados.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.config import DEFAULT_TICKER, WINDOW_SIZE
+from src.metrics import STREAM_SESSION_EVICTIONS, STREAM_SESSIONS
+
+
+class RingWindow:
+    """
+    Janela deslizante de tamanho fixo em um buffer pré-alocado e "duplicado":
+    cada valor é gravado nas posições i e i + W, então `buf[pos:pos + W]` é
+    sempre a janela em ordem cronológica, como view (sem cópia nem np.roll).
+    """
+
+    __slots__ = ("window_size", "_buf", "_pos", "count")
+
+    def __init__(self, window_size: int = WINDOW_SIZE):
+        self.window_size = window_size
+        self._buf = np.zeros(2 * window_size, dtype=np.float64)
+        self._pos = 0
+        self.count = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._buf.nbytes
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.window_size
+
+    def push(self, value: float):
+        self._buf[self._pos] = value
+        self._buf[self._pos + self.window_size] = value
+        self._pos = (self._pos + 1) % self.window_size
+        self.count += 1
+
+    def extend(self, values):
+        for value in values[-self.window_size:]:
+            self.push(value)
+
+    def view(self) -> np.ndarray:
+        """Últimos W valores (mais antigo -> mais recente). Não escreva nela."""
+        return self._buf[self._pos:self._pos + self.window_size]
+
+
+class StreamSession:
+    __slots__ = ("window", "ticker", "lock", "last_seen")
+
+    def __init__(self, window_size: int, ticker: str = DEFAULT_TICKER):
+        self.window = RingWindow(window_size)
+        self.ticker = ticker
+        # Serializa os ticks da sessão: a view não muda enquanto o forward roda
+        self.lock = asyncio.Lock()
+        self.last_seen = time.monotonic()
+
+
+# Custo aproximado de uma sessão além do buffer (objetos Python, lock, chave)
+SESSION_OVERHEAD_BYTES = 512
+
+
+class StreamSessionStore:
+    """
+    Sessões de streaming em LRU. Respeita um teto de memória (`memory_cap_bytes`)
+    e remove sessões ociosas há mais de `idle_ttl` segundos.
+    """
+
+    def __init__(self, memory_cap_bytes: int, idle_ttl: float, window_size: int = WINDOW_SIZE):
+        self.window_size = window_size
+        self.idle_ttl = idle_ttl
+        session_bytes = 2 * window_size * 8 + SESSION_OVERHEAD_BYTES
+        self.max_sessions = max(1, memory_cap_bytes // session_bytes)
+        self._sessions: OrderedDict[str, StreamSession] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> StreamSession | None:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_seen = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def get_or_create(self, session_id: str, ticker: str = DEFAULT_TICKER) -> StreamSession:
+        session = self.get(session_id)
+        if session is None:
+            self._evict_for_new()
+            session = StreamSession(self.window_size, ticker)
+            self._sessions[session_id] = session
+            STREAM_SESSIONS.set(len(self._sessions))
+        return session
+
+    def reset(self, session_id: str, ticker: str = DEFAULT_TICKER) -> StreamSession:
+        self.delete(session_id)
+        return self.get_or_create(session_id, ticker)
+
+    def delete(self, session_id: str) -> bool:
+        removed = self._sessions.pop(session_id, None) is not None
+        STREAM_SESSIONS.set(len(self._sessions))
+        return removed
+
+    def evict_idle(self):
+        now = time.monotonic()
+        # Ordem LRU: as mais antigas ficam no começo
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen <= self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            STREAM_SESSION_EVICTIONS.labels(reason="idle").inc()
+        STREAM_SESSIONS.set(len(self._sessions))
+
+    def _evict_for_new(self):
+        self.evict_idle()
+        while len(self._sessions) >= self.max_sessions:
+            self._sessions.popitem(last=False)
+            STREAM_SESSION_EVICTIONS.labels(reason="memory_cap").inc()
@@ -0,0 +1,336 @@
+import os
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")
+
+import argparse
+import json
+import logging
+import random
+import resource
+import shutil
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+from src.config import DEFAULT_TICKER, WINDOW_SIZE
+from src.data_store import load_series
+from src.windowing import sliding_windows
+
+# --- Treino headless (reprodutível) ---
+# Mesma arquitetura, hiperparâmetros e cortes 70/15/15 do
+# notebooks/01_treinamento_lstm.ipynb, sem Colab/Drive: lê o histórico do store
+# local (src/data_store.py), monta as janelas sob demanda (tf.data com prefetch,
+# ou views do sliding_window_view), treina em CPU com N threads e publica o
+# layout que o load_artifacts espera, já com o .npz do SERVING_MODE=numpy. Com o
+# mesmo SEED, threads e dados, os pesos são idênticos.
+# Duas diferenças deliberadas em relação ao notebook (os pesos não batem com os dele):
+# - Alvo: a janela j (fechamentos D[j..j+59]) prevê y_raw[j+59] = D[j+60], o
+#   fechamento logo após a janela, que é o contrato da API. O create_sequences do
+#   notebook pareia X[i-60:i] com Y[i] = D[i+1], pulando um pregão.
+# - Scalers: ajustados só nos dias vistos pelas janelas de treino; o notebook faz
+#   fit_transform na série inteira, vazando min/máx de validação e teste.
+# Uso: python -m src.train --ticker PETR4.SA --threads 4
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("API_Petrobras")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+SEED = 42
+EPOCHS = 50
+BATCH_SIZE = 64
+PATIENCE = 10
+DROPOUT = 0.15
+TRAIN_RATIO = 0.7
+VAL_RATIO = 0.15
+
+
+def seed_everything(seed: int = SEED):
+    """Fixa todas as fontes de aleatoriedade e força kernels determinísticos."""
+    import tensorflow as tf
+
+    os.environ["PYTHONHASHSEED"] = str(seed)
+    random.seed(seed)
+    np.random.seed(seed)
+    tf.keras.utils.set_random_seed(seed)
+    tf.config.experimental.enable_op_determinism()
+
+
+def configure_threads(threads: int):
+    """Threads do TF em CPU; precisa rodar antes de qualquer op inicializar o runtime."""
+    import tensorflow as tf
+
+    if threads > 0:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(max(1, min(threads, 2)))
+
+
+def build_model(units: tuple[int, int] = (100, 50), dense_units: int = 25, dropout: float = DROPOUT):
+    from tensorflow import keras
+
+    return keras.models.Sequential([
+        keras.layers.Input(shape=(WINDOW_SIZE, 1)),
+        keras.layers.LSTM(units[0], return_sequences=True),
+        keras.layers.Dropout(dropout),
+        keras.layers.LSTM(units[1], return_sequences=False),
+        keras.layers.Dropout(dropout),
+        keras.layers.Dense(dense_units, activation="linear"),
+        keras.layers.Dropout(dropout),
+        keras.layers.Dense(1, activation="linear"),
+    ])
+
+
+def split_bounds(n_windows: int) -> tuple[int, int]:
+    """Cortes cronológicos treino/validação/teste (70/15/15), como no notebook."""
+    return int(n_windows * TRAIN_RATIO), int(n_windows * (TRAIN_RATIO + VAL_RATIO))
+
+
+@dataclass
+class TrainingData:
+    """Série de D (entrada) e D+1 (alvo), normalizadas, com os cortes das janelas."""
+    x_raw: np.ndarray
+    y_raw: np.ndarray
+    x_scaled: np.ndarray
+    y_scaled: np.ndarray
+    scaler_x: object
+    scaler_y: object
+    n_windows: int
+    train_end: int
+    val_end: int
+
+    @property
+    def test_rows(self) -> slice:
+        """Linhas de x_raw/y_raw cujo D+1 é alvo de uma janela de teste."""
+        return slice(self.val_end + WINDOW_SIZE - 1, None)
+
+
+def prepare_data(close: np.ndarray) -> TrainingData:
+    from sklearn.preprocessing import MinMaxScaler
+
+    # Preço de D (entrada) e de D+1 (alvo), sem a última linha (não tem D+1)
+    close = np.asarray(close, dtype=np.float64)
+    x_raw, y_raw = close[:-1].reshape(-1, 1), close[1:].reshape(-1, 1)
+    n_windows = len(x_raw) - WINDOW_SIZE + 1
+    train_end, val_end = split_bounds(n_windows)
+    if train_end <= 0 or val_end <= train_end or n_windows <= val_end:
+        raise ValueError(f"Histórico insuficiente para treino/validação/teste: {len(close)} dias.")
+
+    # Scalers ajustados só com os dias vistos pelas janelas de treino (sem vazar validação/teste)
+    fit_rows = train_end + WINDOW_SIZE - 1
+    scaler_x = MinMaxScaler().fit(x_raw[:fit_rows])
+    scaler_y = MinMaxScaler().fit(y_raw[:fit_rows])
+    return TrainingData(
+        x_raw, y_raw,
+        scaler_x.transform(x_raw).astype(np.float32),
+        scaler_y.transform(y_raw).astype(np.float32),
+        scaler_x, scaler_y, n_windows, train_end, val_end,
+    )
+
+
+def make_dataset(x_scaled, y_scaled, start, end, batch_size, shuffle, seed, input_mode):
+    """
+    Janelas [start, end) como dataset. A janela j cobre x[j:j+60] e o alvo é
+    y[j+59] (fechamento do dia seguinte ao último da janela).
+    - tfdata: timeseries_dataset_from_array monta as janelas em lote, sob demanda
+    - numpy: views do sliding_window_view (sem copiar a série por janela)
+    """
+    import tensorflow as tf
+
+    data = x_scaled[start:end + WINDOW_SIZE - 1]
+    targets = y_scaled[start + WINDOW_SIZE - 1:end + WINDOW_SIZE - 1]
+    if input_mode == "tfdata":
+        dataset = tf.keras.utils.timeseries_dataset_from_array(
+            data, targets, sequence_length=WINDOW_SIZE,
+            batch_size=batch_size, shuffle=shuffle, seed=seed,
+        )
+    else:
+        windows = sliding_windows(data.ravel(), WINDOW_SIZE)[..., np.newaxis]
+        dataset = tf.data.Dataset.from_tensor_slices((windows, targets))
+        if shuffle:
+            dataset = dataset.shuffle(len(targets), seed=seed, reshuffle_each_iteration=True)
+        dataset = dataset.batch(batch_size)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def epoch_monitor():
+    """Callback que registra duração e pico de RSS de cada época."""
+    from tensorflow import keras
+
+    class EpochMonitor(keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.epochs = []
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self._started = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            logs = logs or {}
+            record = {
+                "epoch": epoch + 1,
+                "seconds": round(time.perf_counter() - self._started, 3),
+                "loss": float(logs.get("loss", np.nan)),
+                "val_loss": float(logs.get("val_loss", np.nan)),
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+            }
+            self.epochs.append(record)
+            logger.info(
+                f"Época {record['epoch']:>3}: {record['seconds']:.2f}s | loss {record['loss']:.5f} | "
+                f"val_loss {record['val_loss']:.5f} | pico RSS {record['peak_rss_mb']:.0f} MB"
+            )
+
+    return EpochMonitor()
+
+
+def publish(staging_dir: str, out_dir: str):
+    """Move o diretório completo para o destino de uma vez (o watcher nunca vê metade)."""
+    if os.path.exists(out_dir):
+        raise FileExistsError(f"{out_dir} já existe; escolha outra --release/--out-dir.")
+    os.makedirs(os.path.dirname(os.path.abspath(out_dir)), exist_ok=True)
+    os.replace(staging_dir, out_dir)
+
+
+def train(
+    out_dir: str,
+    ticker: str = DEFAULT_TICKER,
+    csv_path: str | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    epochs: int = EPOCHS,
+    batch_size: int = BATCH_SIZE,
+    threads: int = 0,
+    seed: int = SEED,
+    input_mode: str = "tfdata",
+) -> dict:
+    import joblib
+    import tensorflow as tf
+    from tensorflow import keras
+
+    from src.backtest import fold_metrics
+    from src.inference import export_npz
+
+    configure_threads(threads)
+    seed_everything(seed)
+
+    prices = load_series(ticker, csv_path, start, end)
+    data = prepare_data(prices.to_numpy(dtype=np.float64))
+    x_scaled, y_scaled = data.x_scaled, data.y_scaled
+    scaler_x, scaler_y = data.scaler_x, data.scaler_y
+    n_windows, train_end, val_end = data.n_windows, data.train_end, data.val_end
+
+    train_ds = make_dataset(x_scaled, y_scaled, 0, train_end, batch_size, True, seed, input_mode)
+    val_ds = make_dataset(x_scaled, y_scaled, train_end, val_end, batch_size, False, seed, input_mode)
+    test_ds = make_dataset(x_scaled, y_scaled, val_end, n_windows, batch_size, False, seed, input_mode)
+
+    keras.backend.clear_session()
+    model = build_model()
+    model.compile(optimizer="adam", loss="mae", metrics=["mae", "mape"])
+    monitor = epoch_monitor()
+    early_stop = keras.callbacks.EarlyStopping(
+        monitor="val_loss", patience=PATIENCE, restore_best_weights=True, verbose=1
+    )
+
+    logger.info(
+        f"🏋️ Treinando {ticker}: {train_end} janelas de treino, {val_end - train_end} de validação, "
+        f"{n_windows - val_end} de teste | entrada={input_mode} | threads={threads or 'auto'} | seed={seed}"
+    )
+    started = time.perf_counter()
+    model.fit(train_ds, validation_data=val_ds, epochs=epochs, callbacks=[early_stop, monitor], verbose=0)
+    fit_seconds = time.perf_counter() - started
+
+    # Teste em R$ contra o Naive (D+1 = D), mesmas métricas do backtest
+    y_pred = scaler_y.inverse_transform(model.predict(test_ds, verbose=0)).ravel()
+    y_true = data.y_raw[data.test_rows].ravel()
+    y_naive = data.x_raw[data.test_rows].ravel()
+    test_metrics = fold_metrics(y_true, {"LSTM": y_pred, "Naive": y_naive}, np.array([0, len(y_true)]))
+
+    staging_dir = f"{out_dir.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    model.save(os.path.join(staging_dir, "lstm_model.keras"))
+    joblib.dump(scaler_x, os.path.join(staging_dir, "scaler_X.pkl"))
+    joblib.dump(scaler_y, os.path.join(staging_dir, "scaler_Y.pkl"))
+    export_npz(model, scaler_x, scaler_y, os.path.join(staging_dir, "lstm_model.npz"))
+
+    report = {
+        "ticker": ticker,
+        "source": os.path.abspath(csv_path) if csv_path else "data_store",
+        "data_start": str(prices.index[0].date()),
+        "data_end": str(prices.index[-1].date()),
+        "seed": seed,
+        "threads": threads,
+        "input_mode": input_mode,
+        "batch_size": batch_size,
+        "epochs_run": len(monitor.epochs),
+        "best_epoch": int(np.nanargmin([e["val_loss"] for e in monitor.epochs])) + 1,
+        "fit_seconds": round(fit_seconds, 2),
+        "mean_epoch_seconds": round(float(np.mean([e["seconds"] for e in monitor.epochs])), 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "tensorflow": tf.__version__,
+        "epochs": monitor.epochs,
+        "test": {
+            row["model"]: {k: round(float(row[k]), 4) for k in ("rmse", "mae", "mape", "smape", "mase")}
+            for _, row in test_metrics.iterrows()
+        },
+    }
+    with open(os.path.join(staging_dir, "training_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    publish(staging_dir, out_dir)
+    return report
+
+
+def default_out_dir(ticker: str, release: str) -> str:
+    """src/models[/<TICKER>]/versions/<release>, pronto para o hot-swap."""
+    ticker_dir = MODELS_DIR if ticker == DEFAULT_TICKER else os.path.join(MODELS_DIR, ticker)
+    return os.path.join(ticker_dir, "versions", release)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Treina a LSTM (CPU, determinístico) e publica os artefatos.")
+    parser.add_argument("--ticker", default=DEFAULT_TICKER)
+    parser.add_argument("--csv", default=None, help="Lê de um CSV em vez do store (data/store).")
+    parser.add_argument("--start", default=None, help="Primeiro pregão usado (AAAA-MM-DD).")
+    parser.add_argument("--end", default=None, help="Último pregão usado (AAAA-MM-DD).")
+    parser.add_argument("--release", default=datetime.now().strftime("%Y%m%d-%H%M%S"))
+    parser.add_argument("--out-dir", default=None, help="Padrão: src/models[/<TICKER>]/versions/<release>.")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="0 = padrão do TF.")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--input", dest="input_mode", default="tfdata", choices=("tfdata", "numpy"))
+    args = parser.parse_args()
+
+    out_dir = args.out_dir or default_out_dir(args.ticker, args.release)
+    report = train(
+        out_dir,
+        ticker=args.ticker,
+        csv_path=args.csv,
+        start=args.start,
+        end=args.end,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        threads=args.threads,
+        seed=args.seed,
+        input_mode=args.input_mode,
+    )
+
+    print(f"\n{'época':>6}{'tempo (s)':>11}{'loss':>10}{'val_loss':>10}{'pico RSS (MB)':>15}")
+    for e in report["epochs"]:
+        print(f"{e['epoch']:>6}{e['seconds']:>11.2f}{e['loss']:>10.5f}{e['val_loss']:>10.5f}{e['peak_rss_mb']:>15.0f}")
+    print(
+        f"\n⏱️ {report['epochs_run']} épocas em {report['fit_seconds']:.1f}s "
+        f"(média {report['mean_epoch_seconds']:.2f}s) | melhor época {report['best_epoch']} | "
+        f"pico RSS {report['peak_rss_mb']:.0f} MB"
+    )
+    for name, m in report["test"].items():
+        print(f"Teste {name:<6} MAE R$ {m['mae']:.4f} | RMSE R$ {m['rmse']:.4f} | MAPE {m['mape']:.2f}% | MASE {m['mase']:.3f}")
+    print(f"\n💾 Artefatos em {out_dir}")
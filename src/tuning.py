@@ -0,0 +1,270 @@
+import os
+
+# BLAS do processo principal (e dos workers, até o initializer ajustar) em 1
+# thread: o paralelismo vem dos processos. Definido antes do import do NumPy.
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")
+
+import argparse
+import itertools
+import logging
+import multiprocessing as mp
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from src.backtest import fold_metrics
+from src.config import WINDOW_SIZE
+from src.data_store import load_series
+from src.inference import NumpyBackend
+from src.lstm_numpy import MinMaxParams
+from src.train import BATCH_SIZE, DROPOUT, SEED, prepare_data
+
+# --- Busca de hiperparâmetros em paralelo ---
+# Cada trial (ticker x combinação) treina em um processo do pool, com limite
+# de threads intra/inter-op por worker (workers x threads <= cores). As séries
+# normalizadas de cada ticker ficam em SharedMemory: os workers anexam o mesmo
+# buffer e montam as janelas como views, sem cópia por processo. Trials ruins
+# param cedo pelo EarlyStopping em val_loss. A latência de inferência é medida
+# depois, em série, no runtime NumPy do serving (sem disputa de CPU).
+# Uso: python -m src.tuning --tickers PETR4.SA VALE3.SA --workers 4
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("API_Petrobras")
+
+PATIENCE = 5
+MAX_EPOCHS = 50
+LATENCY_REPEATS = 50
+
+
+class SharedSeries:
+    """x_scaled/y_scaled (float32) de um ticker em um bloco de SharedMemory."""
+
+    def __init__(self, x_scaled: np.ndarray, y_scaled: np.ndarray):
+        rows = np.stack([x_scaled.ravel(), y_scaled.ravel()]).astype(np.float32)
+        self.shape = rows.shape
+        self.shm = shared_memory.SharedMemory(create=True, size=rows.nbytes)
+        np.ndarray(self.shape, dtype=np.float32, buffer=self.shm.buf)[:] = rows
+
+    @property
+    def handle(self) -> tuple[str, tuple[int, int]]:
+        return self.shm.name, self.shape
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+# --- Workers ---
+
+_series: dict = {}
+
+
+def _init_worker(handles: dict, threads: int):
+    """Anexa as séries compartilhadas e limita as threads do TF neste processo."""
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    from src.train import configure_threads
+
+    configure_threads(threads)
+    for ticker, (name, shape) in handles.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _series[ticker] = (shm, np.ndarray(shape, dtype=np.float32, buffer=shm.buf))
+
+
+def _run_trial(trial: dict) -> dict:
+    from tensorflow import keras
+
+    from src.lstm_numpy import NumpyLSTM
+    from src.train import build_model, make_dataset, seed_everything
+
+    _, rows = _series[trial["ticker"]]
+    x_scaled, y_scaled = rows[0][:, np.newaxis], rows[1][:, np.newaxis]
+    n_windows, train_end, val_end = trial["n_windows"], trial["train_end"], trial["val_end"]
+
+    seed_everything(trial["seed"])
+    keras.backend.clear_session()
+    batch_size = trial["batch_size"]
+    train_ds = make_dataset(x_scaled, y_scaled, 0, train_end, batch_size, True, trial["seed"], "tfdata")
+    val_ds = make_dataset(x_scaled, y_scaled, train_end, val_end, batch_size, False, trial["seed"], "tfdata")
+    test_ds = make_dataset(x_scaled, y_scaled, val_end, n_windows, batch_size, False, trial["seed"], "tfdata")
+
+    model = build_model((trial["units1"], trial["units2"]), trial["dense_units"], trial["dropout"])
+    model.compile(optimizer=keras.optimizers.Adam(trial["learning_rate"]), loss="mae")
+    early_stop = keras.callbacks.EarlyStopping(
+        monitor="val_loss", patience=trial["patience"], restore_best_weights=True
+    )
+    started = time.perf_counter()
+    history = model.fit(
+        train_ds, validation_data=val_ds, epochs=trial["max_epochs"], callbacks=[early_stop], verbose=0
+    )
+    val_losses = history.history["val_loss"]
+    return {
+        **trial,
+        "params": model.count_params(),
+        "epochs_run": len(val_losses),
+        "pruned": len(val_losses) < trial["max_epochs"],
+        "best_val_loss": float(np.min(val_losses)),
+        "train_seconds": time.perf_counter() - started,
+        "test_pred_scaled": model.predict(test_ds, verbose=0).ravel(),
+        "runtime": NumpyLSTM.from_keras(model),
+    }
+
+
+# --- Orquestração ---
+
+def search_space(args) -> list[dict]:
+    grid = [
+        dict(zip(("units1", "units2", "dense_units", "dropout", "batch_size", "learning_rate"), values))
+        for values in itertools.product(
+            args.units1, args.units2, args.dense_units, args.dropout, args.batch_sizes, args.learning_rates
+        )
+    ]
+    if args.trials and args.trials < len(grid):
+        grid = random.Random(args.seed).sample(grid, args.trials)
+    return grid
+
+
+def inference_latency(runtime) -> tuple[float, float]:
+    """(p50 em ms de uma janela, µs por janela em lote de 256) no runtime NumPy."""
+    backend = NumpyBackend(runtime)
+    single = np.zeros((1, WINDOW_SIZE, 1), dtype=np.float32)
+    batch = np.zeros((256, WINDOW_SIZE, 1), dtype=np.float32)
+    backend.predict(single)
+    samples = []
+    for _ in range(LATENCY_REPEATS):
+        started = time.perf_counter()
+        backend.predict(single)
+        samples.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    for _ in range(5):
+        backend.predict(batch)
+    per_window = (time.perf_counter() - started) / (5 * len(batch))
+    return float(np.median(samples) * 1e3), per_window * 1e6
+
+
+def pareto_front(df: pd.DataFrame, error: str, cost: str) -> np.ndarray:
+    """True para trials que nenhum outro do mesmo ticker supera em erro E custo."""
+    errors, costs = df[error].to_numpy(), df[cost].to_numpy()
+    same_ticker = df["ticker"].to_numpy()[:, None] == df["ticker"].to_numpy()[None, :]
+    dominated = (
+        same_ticker
+        & (errors[None, :] <= errors[:, None]) & (costs[None, :] <= costs[:, None])
+        & ((errors[None, :] < errors[:, None]) | (costs[None, :] < costs[:, None]))
+    ).any(axis=1)
+    return ~dominated
+
+
+def run_search(datasets: dict, grid: list[dict], workers: int, threads: int, args) -> pd.DataFrame:
+    shared = {ticker: SharedSeries(data.x_scaled, data.y_scaled) for ticker, data in datasets.items()}
+    trials = [
+        {
+            "ticker": ticker, "trial": i, **params,
+            "n_windows": data.n_windows, "train_end": data.train_end, "val_end": data.val_end,
+            "seed": args.seed, "patience": args.patience, "max_epochs": args.max_epochs,
+        }
+        for ticker, data in datasets.items()
+        for i, params in enumerate(grid)
+    ]
+    logger.info(
+        f"🔎 {len(trials)} trials ({len(datasets)} ticker(s) x {len(grid)} combinações) | "
+        f"{workers} workers x {threads} thread(s)"
+    )
+
+    results = []
+    started = time.perf_counter()
+    try:
+        # spawn: TensorFlow não é fork-safe
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=({t: s.handle for t, s in shared.items()}, threads),
+        ) as pool:
+            futures = [pool.submit(_run_trial, trial) for trial in trials]
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                results.append(result)
+                logger.info(
+                    f"[{done}/{len(trials)}] {result['ticker']} trial {result['trial']}: "
+                    f"val_loss {result['best_val_loss']:.5f} em {result['epochs_run']} épocas "
+                    f"({result['train_seconds']:.1f}s){' - parado cedo' if result['pruned'] else ''}"
+                )
+    finally:
+        for series in shared.values():
+            series.close()
+    logger.info(f"⏱️ Busca concluída em {time.perf_counter() - started:.1f}s.")
+
+    rows = []
+    for result in results:
+        data = datasets[result["ticker"]]
+        scaler_y = MinMaxParams.from_sklearn(data.scaler_y)
+        y_pred = scaler_y.inverse_transform(result.pop("test_pred_scaled").reshape(-1, 1)).ravel()
+        y_true = data.y_raw[data.test_rows].ravel()
+        y_naive = data.x_raw[data.test_rows].ravel()
+        metrics = fold_metrics(y_true, {"LSTM": y_pred, "Naive": y_naive}, np.array([0, len(y_true)]))
+        lstm = metrics[metrics["model"] == "LSTM"].iloc[0]
+        latency_ms, per_window_us = inference_latency(result.pop("runtime"))
+        for key in ("n_windows", "train_end", "val_end", "seed", "patience", "max_epochs"):
+            result.pop(key)
+        rows.append({
+            **result,
+            "test_mae_r$": lstm["mae"],
+            "test_rmse_r$": lstm["rmse"],
+            "test_mape": lstm["mape"],
+            "mase": lstm["mase"],
+            "latency_ms_b1": latency_ms,
+            "latency_us_per_window_b256": per_window_us,
+        })
+
+    leaderboard = pd.DataFrame(rows).sort_values(["ticker", "test_mae_r$"], ignore_index=True)
+    leaderboard["pareto"] = pareto_front(leaderboard, "test_mae_r$", "latency_ms_b1")
+    return leaderboard
+
+
+if __name__ == "__main__":
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Busca de hiperparâmetros da LSTM em paralelo (CPU).")
+    parser.add_argument("--tickers", nargs="+", default=[], help="Tickers lidos do store (data/store).")
+    parser.add_argument("--csv", nargs="+", default=[], help="CSVs avulsos (nome do arquivo = ticker).")
+    parser.add_argument("--start", default=None, help="Primeiro pregão usado (AAAA-MM-DD).")
+    parser.add_argument("--end", default=None, help="Último pregão usado (AAAA-MM-DD).")
+    parser.add_argument("--workers", type=int, default=max(1, cpus // 2))
+    parser.add_argument("--threads-per-worker", type=int, default=0, help="0 = cores / workers.")
+    parser.add_argument("--units1", type=int, nargs="+", default=[50, 100])
+    parser.add_argument("--units2", type=int, nargs="+", default=[25, 50])
+    parser.add_argument("--dense-units", type=int, nargs="+", default=[25])
+    parser.add_argument("--dropout", type=float, nargs="+", default=[DROPOUT])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[BATCH_SIZE])
+    parser.add_argument("--learning-rates", type=float, nargs="+", default=[1e-3])
+    parser.add_argument("--trials", type=int, default=0, help="Amostra N combinações da grade (0 = todas).")
+    parser.add_argument("--max-epochs", type=int, default=MAX_EPOCHS)
+    parser.add_argument("--patience", type=int, default=PATIENCE, help="EarlyStopping em val_loss.")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--out", default=os.path.join("reports", "tuning", "leaderboard.parquet"))
+    args = parser.parse_args()
+    if not args.tickers and not args.csv:
+        parser.error("informe --tickers e/ou --csv")
+
+    threads = args.threads_per_worker or max(1, cpus // args.workers)
+    sources = [(ticker.upper(), None) for ticker in args.tickers] + [
+        (os.path.splitext(os.path.basename(path))[0].upper(), path) for path in args.csv
+    ]
+    datasets = {
+        ticker: prepare_data(load_series(ticker, path, args.start, args.end).to_numpy(dtype=np.float64))
+        for ticker, path in sources
+    }
+
+    leaderboard = run_search(datasets, search_space(args), args.workers, threads, args)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    leaderboard.to_parquet(args.out, index=False)
+
+    pd.set_option("display.width", 200)
+    print(leaderboard.to_string(index=False, float_format="%.4f"))
+    print(f"\n💾 {args.out}  (pareto = melhor compromisso erro x latência por ticker)")
@@ -0,0 +1,68 @@
+import threading
+from typing import Callable
+
+import numpy as np
+
+# --- Incerteza por MC dropout (/predict?samples=k) ---
+# As k passadas estocásticas rodam como um único lote (k, 60, 1) com o dropout
+# ativo. O custo do forward é modelado como fixo + k * por_amostra (calibrado
+# com dois lotes na primeira chamada e atualizado por média móvel a cada
+# requisição); o k pedido é reduzido ao maior que cabe no orçamento de latência.
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+MIN_SAMPLES = 2  # desvio-padrão precisa de pelo menos 2 amostras
+
+
+class SampleBudget:
+    """Maior nº de amostras cujo forward estimado cabe em `budget_seconds`."""
+
+    def __init__(self, budget_seconds: float, max_samples: int, probe_samples: int = 32, alpha: float = 0.2):
+        self.budget_seconds = budget_seconds
+        self.max_samples = max(MIN_SAMPLES, max_samples)
+        self.probe_samples = max(MIN_SAMPLES, min(probe_samples, self.max_samples))
+        self.alpha = alpha
+        self.fixed_seconds: float | None = None
+        self.per_sample_seconds: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def calibrated(self) -> bool:
+        return self.per_sample_seconds is not None
+
+    def calibrate(self, forward: Callable[[int], float]):
+        """`forward(k)` executa um lote de k amostras e devolve o tempo gasto (s)."""
+        with self._lock:
+            if self.calibrated:
+                return
+            forward(1)  # descarta: paga trace/alocações do primeiro lote
+            single = forward(1)
+            probe = forward(self.probe_samples)
+            self.per_sample_seconds = max((probe - single) / (self.probe_samples - 1), 1e-9)
+            self.fixed_seconds = max(single - self.per_sample_seconds, 0.0)
+
+    def observe(self, samples: int, seconds: float):
+        if not self.calibrated:
+            return
+        per_sample = max((seconds - self.fixed_seconds) / samples, 1e-9)
+        self.per_sample_seconds += self.alpha * (per_sample - self.per_sample_seconds)
+
+    def estimate(self, samples: int) -> float:
+        return self.fixed_seconds + samples * self.per_sample_seconds
+
+    def cap(self, requested: int) -> int:
+        samples = min(requested, self.max_samples)
+        if self.calibrated and self.budget_seconds > 0:
+            affordable = int((self.budget_seconds - self.fixed_seconds) / self.per_sample_seconds)
+            samples = min(samples, affordable)
+        return max(MIN_SAMPLES, samples)
+
+
+def summarize(samples: np.ndarray, quantiles=QUANTILES, decimals: int = 2) -> dict:
+    """Média, desvio-padrão (amostral) e quantis das k previsões em R$."""
+    samples = np.asarray(samples, dtype=np.float64)
+    values = np.quantile(samples, quantiles)
+    return {
+        "mean": round(float(samples.mean()), decimals),
+        "std": round(float(samples.std(ddof=1)), decimals),
+        "quantiles": {f"p{round(q * 100):02d}": round(float(v), decimals) for q, v in zip(quantiles, values)},
+    }
@@ -0,0 +1,28 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.config import WINDOW_SIZE
+
+
+def sliding_windows(series, window_size: int = WINDOW_SIZE, stride: int = 1) -> np.ndarray:
+    """
+    Janelas deslizantes (N, window_size) sobre uma série 1D.
+    Retorna uma *view* com strides (sem cópia): não escreva nela.
+    """
+    series = np.asarray(series)
+    if series.ndim != 1:
+        raise ValueError("A série deve ser 1D.")
+    if len(series) < window_size:
+        raise ValueError(
+            f"Série com {len(series)} pontos é menor que a janela de {window_size}."
+        )
+    if stride < 1:
+        raise ValueError("O stride deve ser >= 1.")
+    return sliding_window_view(series, window_size)[::stride]
+
+
+def count_windows(length: int, window_size: int = WINDOW_SIZE, stride: int = 1) -> int:
+    """Quantidade de janelas que `sliding_windows` produziria, sem alocar nada."""
+    if length < window_size:
+        return 0
+    return (length - window_size) // stride + 1
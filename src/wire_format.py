@@ -0,0 +1,180 @@
+import numpy as np
+
+from src.config import PREDICT_BATCH_MAX_WINDOWS, WINDOW_SIZE
+from src.windowing import count_windows
+
+# --- Codificações compactas do /predict e /predict/batch ---
+# JSON continua o padrão. Clientes de alto volume podem enviar/receber:
+# - application/octet-stream: float32 little-endian cru (60 valores por janela)
+# - application/msgpack: mesmo contrato do JSON; os arrays podem ser listas ou
+#   `bin` com float32 little-endian
+# Os dois caminhos binários decodificam com np.frombuffer, sem listas Python.
+
+JSON = "application/json"
+OCTET_STREAM = "application/octet-stream"
+MSGPACK = "application/msgpack"
+MSGPACK_ALIASES = (MSGPACK, "application/x-msgpack")
+FLOAT_DTYPE = np.dtype("<f4")
+
+
+class PayloadError(ValueError):
+    """Corpo binário malformado (vira 422)."""
+
+
+class UnsupportedMediaType(ValueError):
+    """Content-Type não suportado (vira 415)."""
+
+
+def media_type(header: str | None) -> str:
+    return (header or "").split(";", 1)[0].strip().lower()
+
+
+def request_format(content_type: str | None) -> str:
+    mt = media_type(content_type)
+    if mt in ("", JSON) or mt.endswith("+json"):
+        return JSON
+    if mt == OCTET_STREAM:
+        return OCTET_STREAM
+    if mt in MSGPACK_ALIASES:
+        return MSGPACK
+    raise UnsupportedMediaType(
+        f"Content-Type {mt} não suportado. Use {JSON}, {OCTET_STREAM} ou {MSGPACK}."
+    )
+
+
+def response_format(accept: str | None) -> str:
+    """Formato da resposta pelo header Accept (respeita q=); sem match -> JSON."""
+    candidates = []
+    for index, part in enumerate((accept or "").split(",")):
+        mt = media_type(part)
+        q = 1.0
+        for param in part.split(";")[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            candidates.append((-q, index, mt))
+    for _, _, mt in sorted(candidates):
+        if mt in (JSON, "*/*", "application/*"):
+            return JSON
+        if mt == OCTET_STREAM:
+            return OCTET_STREAM
+        if mt in MSGPACK_ALIASES:
+            return MSGPACK
+    return JSON
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise UnsupportedMediaType("Suporte a msgpack não instalado no servidor (pip install msgpack).")
+    return msgpack
+
+
+def unpack(body: bytes) -> dict:
+    try:
+        payload = _msgpack().unpackb(body, raw=False)
+    except UnsupportedMediaType:
+        raise
+    except Exception as e:
+        raise PayloadError(f"msgpack inválido: {e}")
+    if not isinstance(payload, dict):
+        raise PayloadError("O corpo msgpack deve ser um mapa.")
+    return payload
+
+
+def pack(payload: dict) -> bytes:
+    return _msgpack().packb(payload, use_bin_type=True)
+
+
+def as_floats(value, field: str) -> np.ndarray:
+    """bytes (float32 LE, sem cópia) ou lista de números -> array 1D/2D finito."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        if len(value) % FLOAT_DTYPE.itemsize:
+            raise PayloadError(f"'{field}': tamanho em bytes não é múltiplo de {FLOAT_DTYPE.itemsize}.")
+        array = np.frombuffer(value, dtype=FLOAT_DTYPE)
+    elif isinstance(value, list):
+        try:
+            array = np.asarray(value, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise PayloadError(f"'{field}' deve conter apenas números.")
+    else:
+        raise PayloadError(f"'{field}' ausente ou com tipo inválido.")
+    if not np.isfinite(array).all():
+        raise PayloadError(f"'{field}' contém NaN ou infinito.")
+    return array
+
+
+def decode_window(body: bytes, fmt: str) -> np.ndarray:
+    """Corpo do /predict -> janela (60,)."""
+    if fmt == OCTET_STREAM:
+        window = as_floats(body, "body")
+    else:
+        window = as_floats(unpack(body).get("last_60_days"), "last_60_days")
+    if window.shape != (WINDOW_SIZE,):
+        raise PayloadError(f"A janela deve ter exatamente {WINDOW_SIZE} valores.")
+    return window
+
+
+def decode_batch(body: bytes, fmt: str, layout: str = "windows", stride: int = 1):
+    """
+    Corpo do /predict/batch -> (windows (N, 60) | None, series (L,) | None, stride).
+    No octet-stream o corpo é um único array; `layout` diz se são janelas
+    concatenadas ou uma série contínua.
+    """
+    windows = series = None
+    windows_are_bytes = True
+    if fmt == OCTET_STREAM:
+        values = as_floats(body, "body")
+        if layout == "series":
+            series = values
+        else:
+            windows = values
+    else:
+        payload = unpack(body)
+        if ("windows" in payload) == ("series" in payload):
+            raise PayloadError("Informe exatamente um entre 'windows' e 'series'.")
+        if "windows" in payload:
+            windows_are_bytes = isinstance(payload["windows"], (bytes, bytearray, memoryview))
+            windows = as_floats(payload["windows"], "windows")
+        else:
+            series = as_floats(payload["series"], "series")
+        stride = payload.get("stride", stride)
+
+    if not isinstance(stride, int) or isinstance(stride, bool) or stride < 1:
+        raise PayloadError("'stride' deve ser um inteiro >= 1.")
+
+    if windows is not None:
+        if windows_are_bytes:
+            # Bytes (octet-stream / msgpack `bin`): janelas concatenadas por definição
+            if windows.size == 0 or windows.size % WINDOW_SIZE:
+                raise PayloadError(f"'windows' deve ter N x {WINDOW_SIZE} valores (N >= 1).")
+            windows = windows.reshape(-1, WINDOW_SIZE)
+        elif windows.ndim != 2 or windows.shape[0] == 0 or windows.shape[1] != WINDOW_SIZE:
+            # Lista de listas: cada janela precisa ter exatamente 60 valores (como no JSON)
+            raise PayloadError(f"Cada janela de 'windows' deve ter exatamente {WINDOW_SIZE} valores.")
+        n_windows = windows.shape[0]
+    else:
+        if series.ndim != 1 or series.size < WINDOW_SIZE:
+            raise PayloadError(f"'series' deve ter ao menos {WINDOW_SIZE} valores.")
+        n_windows = count_windows(series.size, WINDOW_SIZE, stride)
+
+    if n_windows > PREDICT_BATCH_MAX_WINDOWS:
+        raise PayloadError(
+            f"Lote com {n_windows} janelas excede o limite de {PREDICT_BATCH_MAX_WINDOWS}."
+        )
+    return windows, series, stride
+
+
+def encode_predictions(payload: dict, predictions: np.ndarray, fmt: str) -> bytes:
+    """
+    Resposta binária: octet-stream = previsões em float32 LE cru (sem arredondar);
+    msgpack = o mesmo corpo da resposta JSON.
+    """
+    if fmt == OCTET_STREAM:
+        return np.asarray(predictions, dtype=FLOAT_DTYPE).tobytes()
+    return pack(payload)